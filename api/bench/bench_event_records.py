@@ -0,0 +1,121 @@
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_record import EventRecord, URGENCY_ORDER  # noqa: E402
+
+
+# --- Benchmark: dict events vs. EventRecord at crawl scale ---
+# Compares memory held by N formatted events and the per-event post-processing cost
+# (urgency check + sort), the old dict way vs. records.
+#
+#   python bench/bench_event_records.py            # 10k, 50k, 100k
+#   python bench/bench_event_records.py 250000
+
+CATEGORIES = ["Seminar", "Music", "Career Fair", "Workshop", "Arts", "Sports", "Social", "Lecture", "Expo", "General"]
+TAGS = ["research", "students", "music", "career", "networking", "art", "sports", "free", "food", "faculty", "science"]
+
+
+def synthetic_events(n, seed=0):
+    """LLM-shaped dicts, decoded from JSON like a real response (so strings aren't shared)."""
+    rng = random.Random(seed)
+    today = date.today()
+    events = []
+    for i in range(n):
+        start = today + timedelta(days=rng.randint(-2, 60))
+        events.append({
+            "title": f"Event {i} {rng.choice(CATEGORIES)}",
+            "date": start.strftime("%a, %b %d, %Y") + " 3pm to 4pm",
+            "location": f"Building {rng.randint(1, 80)}",
+            "link": f"https://events.purdue.edu/event/{i}",
+            "image": f"https://events.purdue.edu/images/{i}.jpg",
+            "description": "Lorem ipsum dolor sit amet. " * rng.randint(2, 10),
+            "parsed_date": start.strftime("%a, %b %d, %Y"),
+            "time": "3pm to 4pm",
+            "short_description": "A short summary of the event.",
+            "category": rng.choice(CATEGORIES),
+            "ranking": i + 1,
+            "tags": rng.sample(TAGS, 3),
+        })
+    return json.loads(json.dumps(events))
+
+
+def dict_postprocess(events, today):
+    """The pre-record pipeline: strptime for the urgency check, strptime again for the sort."""
+    def parse(text):
+        for fmt in ["%a, %b %d, %Y", "%b %d, %Y"]:
+            try:
+                return datetime.strptime(text.split(' - ')[0], fmt).date()
+            except ValueError:
+                continue
+        return None
+
+    for event in events:
+        event_date = parse(event.get('parsed_date'))
+        days = (event_date - today).days if event_date else None
+        event['calculated_urgency_check'] = (
+            'high' if days is not None and 0 <= days <= 3 else
+            'medium' if days is not None and 3 < days <= 7 else 'low')
+    events.sort(key=lambda e: (URGENCY_ORDER[e['calculated_urgency_check']], parse(e.get('parsed_date')) or date.max))
+    return events
+
+
+def record_postprocess(records, today):
+    for record in records:
+        record.refresh_urgency(today)
+    records.sort(key=EventRecord.sort_key)
+    return records
+
+
+def measure_memory(build):
+    """Returns (result, bytes still allocated by build())."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def measure_time(fn):
+    """Seconds for fn(), timed without tracemalloc (which slows allocation-heavy code)."""
+    gc.collect()
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def run(n):
+    today = date.today()
+    raw_json = json.dumps(synthetic_events(n))
+
+    _, dict_bytes = measure_memory(lambda: json.loads(raw_json))
+    dicts = json.loads(raw_json)
+    dict_seconds = measure_time(lambda: dict_postprocess(dicts, today))
+    del dicts
+
+    _, record_bytes = measure_memory(lambda: [EventRecord.from_dict(d) for d in json.loads(raw_json)])
+    dicts = json.loads(raw_json)
+    records = []
+    convert_seconds = measure_time(lambda: records.extend(EventRecord.from_dict(d) for d in dicts))
+    del dicts
+    record_seconds = measure_time(lambda: record_postprocess(records, today))
+    del records
+
+    print(f"{n:>8} events | memory dict {dict_bytes / 1e6:7.1f} MB  record {record_bytes / 1e6:7.1f} MB "
+          f"({(1 - record_bytes / dict_bytes) * 100:4.1f}% less) | "
+          f"post-process dict {dict_seconds * 1e6 / n:6.2f} us/event  "
+          f"record {record_seconds * 1e6 / n:6.2f} us/event (+ {convert_seconds * 1e6 / n:.2f} us/event to build)")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 50_000, 100_000]
+    for size in sizes:
+        run(size)
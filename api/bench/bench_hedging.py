@@ -0,0 +1,138 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_openai_server
+from fake_openai_server import FakeOpenAIHandler
+from hedging import HedgeStats, LatencyTracker, hedged_stream
+from json_stream import parse_events_array
+
+
+# --- Tail-latency benchmark for hedged OpenAI calls ---
+# Starts the fake OpenAI server with a heavy-tailed (Pareto) first-byte delay and runs the
+# same sequence of formatting calls three ways: plain, hedged at p90, and hedged with a
+# faster fallback model. Reports p50/p90/p99 latency, hedge rate and the extra requests
+# hedging costs.
+#
+#   python bench/bench_hedging.py --calls 300 --latency-scale 0.05 --latency-alpha 1.2
+
+SAMPLE_EVENTS = [
+    {"title": f"Sample event {i}", "date": "Mon, May 5, 2025", "location": "PMU",
+     "link": f"https://events.purdue.edu/event/{i}", "image": None, "description": "A sample event. More text."}
+    for i in range(7)
+]
+
+
+class QuietHandler(FakeOpenAIHandler):
+    requests_served = 0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        QuietHandler.requests_served += 1
+        super().do_POST()
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # Abandoned hedges and timed-out calls hang up mid-response; that's expected
+
+
+def start_server():
+    server = QuietServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def attempt_factory(base_url):
+    """start_attempt for hedged_stream: one non-streamed call to the fake server."""
+    def start_attempt(model, status, timeout, stop):
+        body = json.dumps({
+            "model": model,
+            "messages": [{"role": "user", "content": f"Input JSON ({len(SAMPLE_EVENTS)} events):\n{json.dumps(SAMPLE_EVENTS)}"}],
+        }).encode()
+        req = urllib.request.Request(f"{base_url}/chat/completions", data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as response:
+                content = json.load(response)["choices"][0]["message"]["content"]
+        except OSError as e:
+            status["error"] = f"Error calling OpenAI API: {e}"
+            return
+        if stop.is_set():
+            return
+        events, status["truncated"] = parse_events_array(content)
+        yield from events
+    return start_attempt
+
+
+def run_mode(base_url, calls, deadline, hedging, fallback_model, default_hedge_after, seed):
+    random.seed(seed) # Same delay sequence for every mode (up to the extra hedge draws)
+    tracker = LatencyTracker(default=default_hedge_after)
+    stats = HedgeStats()
+    start_attempt = attempt_factory(base_url)
+    served_before = QuietHandler.requests_served
+    failures = 0
+    with contextlib.redirect_stdout(io.StringIO()): # hedged_stream logs every hedge
+        for _ in range(calls):
+            status = {}
+            events = list(hedged_stream(start_attempt, status, tracker, stats, deadline,
+                                        primary_model="gpt-3.5-turbo", fallback_model=fallback_model,
+                                        hedging=hedging))
+            if not events:
+                failures += 1
+    result = stats.snapshot()
+    result["requests_per_call"] = round((QuietHandler.requests_served - served_before) / calls, 3)
+    result["failed_calls"] = failures
+    return result
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compare tail latency of plain vs hedged OpenAI calls against a heavy-tailed fake server.")
+    arg_parser.add_argument("--calls", type=int, default=200)
+    arg_parser.add_argument("--latency-scale", type=float, default=0.05, help="Minimum first-byte wait (s).")
+    arg_parser.add_argument("--latency-alpha", type=float, default=1.2, help="Pareto shape; smaller is heavier-tailed.")
+    arg_parser.add_argument("--deadline", type=float, default=3.0, help="Per-call deadline (s).")
+    arg_parser.add_argument("--seed", type=int, default=1)
+    arg_parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = arg_parser.parse_args(argv)
+
+    fake_openai_server.CONFIG.update(delay=0.0, latency_scale=args.latency_scale,
+                                     latency_alpha=args.latency_alpha, latency_cap=args.deadline * 2,
+                                     fast_model="gpt-4o-mini")
+    server = start_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    default_hedge_after = args.latency_scale * 3
+    try:
+        results = {
+            "plain": run_mode(base_url, args.calls, args.deadline, False, None, default_hedge_after, args.seed),
+            "hedged": run_mode(base_url, args.calls, args.deadline, True, None, default_hedge_after, args.seed),
+            "hedged+fallback": run_mode(base_url, args.calls, args.deadline, True, "gpt-4o-mini", default_hedge_after, args.seed),
+        }
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{args.calls} calls, Pareto first-byte delay (scale={args.latency_scale}s, alpha={args.latency_alpha}), deadline {args.deadline}s")
+    print(f"{'mode':<17}{'p50 s':>8}{'p90 s':>8}{'p99 s':>8}{'hedge rate':>12}{'req/call':>10}{'deadline miss':>15}")
+    for mode, r in results.items():
+        print(f"{mode:<17}{r['latency_p50'] or 0:>8.3f}{r['latency_p90'] or 0:>8.3f}{r['latency_p99'] or 0:>8.3f}"
+              f"{r['hedge_rate']:>12.1%}{r['requests_per_call']:>10.2f}{r['deadline_exceeded']:>15}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+# --- Import-time benchmark for cold starts ---
+# Runs `python -X importtime -c "import <module>"` in a fresh interpreter (a few times,
+# keeping the fastest run) and reports the module's cumulative import time plus the
+# slowest top-level imports. Use --max-ms in CI/cron to catch startup regressions:
+#
+#   python bench/bench_import_time.py                      # event_scrapper_flask
+#   python bench/bench_import_time.py --max-ms 400 --json
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_once(module):
+    """Returns (module_total_us, {direct_dependency: cumulative_us}) from one fresh interpreter."""
+    env = dict(os.environ, WARM_UP="0", PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # -X importtime prints children before their parent, indented two more spaces.
+    pending_children = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 3:
+            pending_children[name] = cumulative_us
+        elif indent == 1:
+            if name == module:
+                return cumulative_us, pending_children
+            pending_children = {}
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Measure cold import time of the service module.")
+    arg_parser.add_argument("module", nargs="?", default="event_scrapper_flask")
+    arg_parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to try; the fastest is kept.")
+    arg_parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list.")
+    arg_parser.add_argument("--max-ms", type=float, help="Exit 1 if the module takes longer than this to import.")
+    arg_parser.add_argument("--json", action="store_true", help="Print one JSON line instead of a table.")
+    args = arg_parser.parse_args(argv)
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    total_us, children = min(runs, key=lambda run: run[0])
+    total_ms = total_us / 1000
+    slowest = sorted(((name, us / 1000) for name, us in children.items()),
+                     key=lambda item: item[1], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({"module": args.module, "import_ms": round(total_ms, 1),
+                          "slowest": {name: round(ms, 1) for name, ms in slowest}}))
+    else:
+        print(f"⏱ import {args.module}: {total_ms:.1f} ms (best of {args.runs})")
+        for name, ms in slowest:
+            print(f"   {ms:8.1f} ms  {name}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"❌ Import time {total_ms:.1f} ms exceeds the {args.max_ms:.1f} ms budget.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
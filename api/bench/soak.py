@@ -0,0 +1,428 @@
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+
+# --- Soak / leak test for the Flask service ---
+# Runs the real service in this process against two local stubs (a fake events site with
+# the events.purdue.edu markup, and fake_openai_server.py) that live in a child process,
+# then drives /events, /events/stream, /events.ics, / and /images for hours. Every
+# --interval it samples RSS, tracemalloc (total plus top growing allocation sites),
+# open fds and sockets, and thread count. After --warmup, growth between the median of
+# the first and last few samples must stay under the thresholds, or it exits 1 (2 if the
+# harness itself fails, e.g. the stubs never start or no post-warm-up samples were taken).
+#
+#   python bench/soak.py --duration 4h --interval 60 --output soak.jsonl
+#   python bench/soak.py --duration 3m --interval 5 --warmup 30s     # smoke run
+#
+# The pipeline runs on every /events (EVENTS_CACHE_TTL_SECONDS=0 by default) so
+# scraping, OpenAI streaming, hedging, classification and the image proxy are all
+# exercised, not just the snapshot cache.
+
+EXIT_OK = 0
+EXIT_LEAK = 1
+EXIT_ERROR = 2 # The harness itself failed (stubs didn't start, too few samples, ...), nothing was judged
+
+
+
+def tiny_png():
+    """A valid 1x1 PNG, so the image proxy has something real to decode and resize."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\x00\xcf\x8e\x00")) + chunk(b"IEND", b""))
+
+
+# --- Stubs (child process) ---
+class SiteStubHandler(BaseHTTPRequestHandler):
+    """A list page of '.em-card' cards plus detail and image pages, dated relative to today."""
+    protocol_version = "HTTP/1.1"
+    event_count = 40
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _event_date(self, i):
+        return datetime.date.today() + datetime.timedelta(days=(i * 3) % 30 - 2)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/":
+            cards = "".join(
+                f'<div class="em-card"><img src="/img/{i}.png">'
+                f'<h3 class="em-card_title"><a href="/event/{i}">Soak event {i}</a></h3>'
+                f'<p class="em-card_event-text">{self._event_date(i):%a, %b %d, %Y} 3:00 PM</p>'
+                f'<p class="em-card_event-text"><a href="#">Room {i}</a></p></div>'
+                for i in range(self.event_count))
+            self._send(f"<html><body>{cards}</body></html>".encode(), "text/html")
+        elif path.startswith("/event/"):
+            i = int(path.rsplit("/", 1)[1])
+            start = self._event_date(i)
+            # Every fifth event runs for three days, so /events.ics renders multi-day events too.
+            date_text = f"{start:%b %d} - {start + datetime.timedelta(days=2):%b %d, %Y}" if i % 5 == 0 else f"{start:%a, %b %d, %Y}"
+            body = (f'<html><body><div class="em-list_dates__container"><p class="em-date">{date_text}</p></div>'
+                    f'<div class="em-about_description">Soak event {i} description. Music, talks and food '
+                    f'for students. {"Lorem ipsum dolor sit amet. " * (i % 7 + 1)}</div></body></html>')
+            self._send(body.encode(), "text/html")
+        elif path.startswith("/img/"):
+            self._send(tiny_png(), "image/png")
+        else:
+            self.send_error(404)
+
+
+def serve_stubs(site_port, openai_port, event_count, openai_delay):
+    import fake_openai_server
+    from fake_openai_server import FakeOpenAIHandler
+
+    class QuietOpenAIHandler(FakeOpenAIHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+    SiteStubHandler.event_count = event_count
+    fake_openai_server.CONFIG.update(delay=openai_delay, chunk_size=40)
+    servers = [ThreadingHTTPServer(("127.0.0.1", site_port), SiteStubHandler),
+               ThreadingHTTPServer(("127.0.0.1", openai_port), QuietOpenAIHandler)]
+    for server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🧪 Stubs up: site http://127.0.0.1:{site_port}/ openai http://127.0.0.1:{openai_port}/v1", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=1):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+# --- Resource sampling (this process) ---
+def proc_status():
+    """Fields of /proc/self/status (Linux). Empty elsewhere."""
+    try:
+        with open("/proc/self/status") as f:
+            return dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+
+
+def open_fds():
+    """(open fds, of which sockets), or (None, None) where /proc isn't available."""
+    try:
+        names = os.listdir("/proc/self/fd")
+    except OSError:
+        return None, None
+    sockets = 0
+    for name in names:
+        with contextlib.suppress(OSError):
+            if os.readlink(f"/proc/self/fd/{name}").startswith("socket:"):
+                sockets += 1
+    return len(names), sockets
+
+
+def take_sample(started, requests_done):
+    status = proc_status()
+    fds, sockets = open_fds()
+    rss_kb = int(status["VmRSS"].split()[0]) if "VmRSS" in status else None
+    if rss_kb is None:
+        import resource
+        rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # Peak, not current, off Linux
+    traced, _ = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    return {
+        "t": round(time.time() - started, 1),
+        "requests": requests_done,
+        "rss_mb": round(rss_kb / 1024, 2),
+        "traced_mb": round(traced / 1024 / 1024, 2),
+        "fds": fds,
+        "sockets": sockets,
+        "threads": int(status["Threads"]) if "Threads" in status else threading.active_count(),
+    }
+
+
+def filtered_snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+
+
+def top_growth(baseline, top):
+    """Allocation sites that grew the most since `baseline`, as printable strings."""
+    stats = filtered_snapshot().compare_to(baseline, "lineno")
+    return [f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks) {stat.traceback[0]}"
+            for stat in stats[:top] if stat.size_diff > 0]
+
+
+# --- Load driver ---
+class LoadDriver:
+    ENDPOINT_WEIGHTS = (("/events", 6), ("/events/stream", 2), ("/events.ics", 2), ("/", 1), ("image", 2))
+
+    def __init__(self, base_url, clients, think_time):
+        self.base_url = base_url
+        self.clients = clients
+        self.think_time = think_time
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.errors = {}
+        self.image_paths = []
+        self.threads = []
+
+    @property
+    def total(self):
+        with self.lock:
+            return sum(self.counts.values())
+
+    def _record(self, endpoint, error=None):
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def _request(self, endpoint):
+        path = endpoint
+        if endpoint == "image":
+            with self.lock:
+                if not self.image_paths:
+                    return
+                path = f"{random.choice(self.image_paths)}?w={random.choice((160, 320, 640))}"
+        try:
+            with urllib.request.urlopen(self.base_url + path, timeout=120) as response:
+                body = response.read()
+            if endpoint == "/events":
+                thumbnails = [e.get("image_thumbnail") for e in json.loads(body).get("events", [])]
+                with self.lock:
+                    self.image_paths = [t for t in thumbnails if t] or self.image_paths
+            self._record(endpoint)
+        except urllib.error.HTTPError as e:
+            # 503 from /events.ics before the first snapshot is expected, as are 429s
+            self._record(endpoint, None if e.code in (429, 503) else f"{endpoint} HTTP {e.code}")
+        except (OSError, ValueError) as e:
+            self._record(endpoint, f"{endpoint} {type(e).__name__}")
+
+    def _run(self):
+        endpoints = [name for name, weight in self.ENDPOINT_WEIGHTS for _ in range(weight)]
+        while not self.stop.is_set():
+            self._request(random.choice(endpoints))
+            self.stop.wait(self.think_time)
+
+    def start(self):
+        for i in range(self.clients):
+            thread = threading.Thread(target=self._run, name=f"soak-client-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def shutdown(self):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join(timeout=130)
+
+
+def parse_duration(value):
+    """'90', '90s', '30m' or '4h' -> seconds."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    try:
+        if value[-1:] in units:
+            return float(value[:-1]) * units[value[-1]]
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a duration like 90s, 30m or 4h, got {value!r}")
+
+
+def evaluate(samples, args):
+    """Compares the median of the first and last few post-warm-up samples. Returns [(check, growth, limit, ok)]."""
+    steady = [s for s in samples if s["t"] >= args.warmup]
+    if len(steady) < 2:
+        return []
+    window = max(1, min(args.window, len(steady) // 3))
+    first, last = steady[:window], steady[-window:]
+
+    checks = []
+    for key, limit in (("rss_mb", args.max_rss_growth_mb), ("traced_mb", args.max_traced_growth_mb),
+                       ("fds", args.max_fd_growth), ("sockets", args.max_fd_growth), ("threads", args.max_thread_growth)):
+        before = [s[key] for s in first if s[key] is not None]
+        after = [s[key] for s in last if s[key] is not None]
+        if not before or not after or (key == "traced_mb" and not any(after)):
+            continue # Not measurable on this platform / tracemalloc disabled
+        growth = statistics.median(after) - statistics.median(before)
+        checks.append((f"{key} growth", round(growth, 2), limit, growth <= limit))
+    return checks
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Soak-test the events service and fail on resource growth.")
+    arg_parser.add_argument("--duration", type=parse_duration, default=parse_duration("1h"))
+    arg_parser.add_argument("--interval", type=parse_duration, default=parse_duration("30s"), help="Sampling interval.")
+    arg_parser.add_argument("--warmup", type=parse_duration, default=parse_duration("5m"),
+                            help="Ignore samples before this (imports, caches, first classifier load).")
+    arg_parser.add_argument("--window", type=int, default=5, help="Samples averaged (median) at each end.")
+    arg_parser.add_argument("--clients", type=int, default=4)
+    arg_parser.add_argument("--think-time", type=float, default=0.5, help="Seconds each client waits between requests.")
+    arg_parser.add_argument("--events", type=int, default=40, help="Events on the fake site.")
+    arg_parser.add_argument("--openai-delay", type=float, default=0.002, help="Fake OpenAI delay per streamed chunk.")
+    arg_parser.add_argument("--events-cache-ttl", type=int, default=0, help="EVENTS_CACHE_TTL_SECONDS for the service.")
+    arg_parser.add_argument("--max-rss-growth-mb", type=float, default=50)
+    arg_parser.add_argument("--max-traced-growth-mb", type=float, default=20)
+    arg_parser.add_argument("--max-fd-growth", type=int, default=20)
+    arg_parser.add_argument("--max-thread-growth", type=int, default=10)
+    arg_parser.add_argument("--max-error-rate", type=float, default=0.01)
+    arg_parser.add_argument("--top", type=int, default=10, help="Allocation sites reported per sample.")
+    arg_parser.add_argument("--no-tracemalloc", action="store_true", help="Skip tracemalloc (it slows the service down).")
+    arg_parser.add_argument("--output", help="Append samples as JSON lines here.")
+    arg_parser.add_argument("--service-log", default=os.devnull, help="Where the service's own output goes.")
+    arg_parser.add_argument("--serve-stubs", action="store_true", help=argparse.SUPPRESS)
+    arg_parser.add_argument("--site-port", type=int, help=argparse.SUPPRESS)
+    arg_parser.add_argument("--openai-port", type=int, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+
+    if args.serve_stubs:
+        serve_stubs(args.site_port, args.openai_port, args.events, args.openai_delay)
+        return EXIT_OK
+
+    site_port, openai_port, service_port = free_port(), free_port(), free_port()
+    stubs = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve-stubs",
+                              "--site-port", str(site_port), "--openai-port", str(openai_port),
+                              "--events", str(args.events), "--openai-delay", str(args.openai_delay)])
+    work_dir = tempfile.mkdtemp(prefix="soak-")
+    try:
+        if not (wait_for_port(site_port) and wait_for_port(openai_port)):
+            print("❌ Stubs did not start.")
+            return EXIT_ERROR
+
+        # The service reads its configuration at import time.
+        os.environ.update({
+            "OPENAI_API_KEY": "soak-test",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+            "EVENT_SOURCES": json.dumps([{"kind": "purdue", "name": "soak-site", "url": f"http://127.0.0.1:{site_port}/",
+                                          "requests_per_second": 1000, "burst": 100}]),
+            "EVENTS_CACHE_TTL_SECONDS": str(args.events_cache_ttl),
+            "SOURCE_CACHE_TTL_SECONDS": "0",
+            "EVENTS_RATE_PER_CLIENT_PER_MIN": "1000000", "EVENTS_BURST_PER_CLIENT": "1000",
+            "EVENTS_RATE_GLOBAL_PER_MIN": "1000000", "EVENTS_BURST_GLOBAL": "1000",
+            "WARM_UP": "0",
+            "IMAGE_CACHE_DIR": os.path.join(work_dir, "image_cache"),
+            "PROFILE_DIR": os.path.join(work_dir, "profiles"),
+            "EVENT_HISTORY_PATH": os.path.join(work_dir, "formatted_events.jsonl"),
+            "CLASSIFIER_MODEL_PATH": os.path.join(work_dir, "classifier.json"),
+        })
+        if not args.no_tracemalloc:
+            tracemalloc.start(5)
+
+        report = sys.stdout
+        with open(args.service_log, "w") as service_log, \
+                contextlib.redirect_stdout(service_log), contextlib.redirect_stderr(service_log):
+            import event_scrapper_flask
+            from werkzeug.serving import make_server
+            logging.getLogger("werkzeug").setLevel(logging.WARNING) # One access-log line per request otherwise
+            # Load everything that is imported lazily now, so it isn't counted as growth after warm-up.
+            event_scrapper_flask.warm_up()
+            with contextlib.suppress(ImportError):
+                import PIL.Image # noqa: F401  Imported by the image proxy on first resize
+            server = make_server("127.0.0.1", service_port, event_scrapper_flask.app, threaded=True)
+            threading.Thread(target=server.serve_forever, name="soak-service", daemon=True).start()
+
+            driver = LoadDriver(f"http://127.0.0.1:{service_port}", args.clients, args.think_time)
+            output = open(args.output, "a") if args.output else None
+            samples = []
+            baseline = None
+            started = time.time()
+            print(f"🧪 Soaking for {args.duration:.0f}s with {args.clients} clients; sampling every {args.interval:.0f}s.", file=report, flush=True)
+            run_until = started + args.duration
+            driver.start()
+            try:
+                while time.time() < run_until:
+                    time.sleep(min(args.interval, max(0, run_until - time.time())))
+                    sample = take_sample(started, driver.total)
+                    if tracemalloc.is_tracing():
+                        # Snapshots of a big heap take a while; don't let them eat into the sampled run.
+                        snapshot_started = time.time()
+                        if baseline is None and sample["t"] >= args.warmup:
+                            baseline = filtered_snapshot()
+                        elif baseline is not None:
+                            sample["top_growth"] = top_growth(baseline, args.top)
+                        run_until += time.time() - snapshot_started
+                    samples.append(sample)
+                    if output:
+                        output.write(json.dumps(sample) + "\n")
+                        output.flush()
+                    print(f"   t={sample['t']:>7.0f}s req={sample['requests']:<7} rss={sample['rss_mb']:.1f}MB "
+                          f"traced={sample['traced_mb']:.1f}MB fds={sample['fds']} sockets={sample['sockets']} "
+                          f"threads={sample['threads']}", file=report, flush=True)
+            finally:
+                driver.shutdown()
+                server.shutdown()
+                if output:
+                    output.close()
+    finally:
+        stubs.terminate()
+        stubs.wait(timeout=10)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    total = driver.total
+    error_count = sum(driver.errors.values())
+    error_rate = error_count / total if total else 1.0
+    checks = evaluate(samples, args)
+    checks.append(("error_rate", round(error_rate, 4), args.max_error_rate, error_rate <= args.max_error_rate))
+
+    print(f"\n📊 {total} requests: {json.dumps(driver.counts)}")
+    if driver.errors:
+        print(f"   Errors: {json.dumps(driver.errors)}")
+    if samples and samples[-1].get("top_growth"):
+        print("   Top allocation growth since warm-up:")
+        for line in samples[-1]["top_growth"]:
+            print(f"     {line}")
+    for name, value, limit, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}: {value} (limit {limit})")
+    if len(checks) == 1:
+        print(f"❌ Not enough samples after the {args.warmup:.0f}s warm-up to judge growth; run longer.")
+        return EXIT_ERROR
+    failed = [name for name, _, _, ok in checks if not ok]
+    if failed:
+        print(f"❌ Soak failed: {', '.join(failed)}")
+        return EXIT_LEAK
+    print("✅ Soak passed.")
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,22 @@
 import os
-import requests
 import json
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from openai import OpenAI
-from datetime import date
+from datetime import date, datetime
 import traceback
 import time
 import re # Needed for cleaning aria-label
+import sys
+import argparse
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from event_record import parse_display_date, urgency_for
+from json_stream import parse_events_array, find_missing_events, event_identity, SentEventMatcher
+from scrape_queue import estimate_card_date
+from sources import EXTRACTORS, PurdueExtractor, create_source
 
 # --- Configuration ---
 # Load environment variables from .env file
@@ -22,7 +31,7 @@ except Exception as e:
     exit(1)
 
 # URL to scrape
-PURDUE_EVENTS_URL = "https://events.purdue.edu/"
+PURDUE_EVENTS_URL = PurdueExtractor.default_url
 
 # OpenAI Model Configuration
 OPENAI_MODEL = "gpt-4o-mini" # Or "gpt-4-turbo", etc.
@@ -33,147 +42,21 @@ MAX_TOKENS_COMPLETION = 4000 # Adjust based on expected output length and model
 # Set to a number (e.g., 15) to limit the batch size.
 EVENT_BATCH_SIZE_FOR_OPENAI = 7
 
-# Browser-like Headers for Requests
-REQUEST_HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
-    'Accept-Language': 'en-US,en;q=0.9',
-    'Accept-Encoding': 'gzip, deflate, br',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1',
-    'Sec-Fetch-Dest': 'document',
-    'Sec-Fetch-Mode': 'navigate',
-    'Sec-Fetch-Site': 'none',
-    'Sec-Fetch-User': '?1',
-    'Cache-Control': 'max-age=0',
-}
+# Politeness delay: sustained detail-page requests per second to a site
+SCRAPE_REQUESTS_PER_SECOND = 3
 
 # --- Web Scraping Function ---
-def fetch_purdue_events():
+def fetch_events(events_url=PURDUE_EVENTS_URL, kind="purdue", requests_per_second=SCRAPE_REQUESTS_PER_SECOND):
     """
-    Scrapes raw event data from Purdue Events.
-    - Gets Title, Link, Image, Location (basic) from the main list page.
-    - Visits each event's detail page to get Date (from header) and Description.
+    Scrapes one calendar with the registered extractor for `kind` (see sources.py).
+    Returns raw event dicts (title, date, location, link, image, description), soonest
+    events first, or [] if the list page couldn't be fetched.
     """
-    print(f"🟡 Requesting data from {PURDUE_EVENTS_URL}...")
-    try:
-        list_response = requests.get(PURDUE_EVENTS_URL, headers=REQUEST_HEADERS, timeout=20)
-        list_response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error fetching list URL {PURDUE_EVENTS_URL}: {e}")
+    source = create_source(kind, url=events_url, requests_per_second=requests_per_second)
+    events, error = source.scrape()
+    if error:
         return []
-
-    print("🟢 Successfully fetched event list HTML. Parsing...")
-    list_soup = BeautifulSoup(list_response.text, 'lxml')
-    events = []
-    event_cards = list_soup.select(".em-card")
-    print(f"🔍 Found {len(event_cards)} potential event cards on the main page.")
-    event_count = 0
-
-    for el in event_cards:
-        event_count += 1
-        print(f"\n--- Processing card {event_count}/{len(event_cards)} ---")
-
-        # --- Extract basic info from List Page Card (el) ---
-        title_tag = el.select_one(".em-card_title a")
-        title = title_tag.text.strip() if title_tag else None
-
-        if not title:
-            print("   Skipping card: No title found.")
-            continue
-        print(f"   Title: {title}")
-
-        # Location from List Page (basic attempt)
-        location_tag = el.select_one(".em-card_event-text a")
-        location = location_tag.text.strip() if location_tag else None
-        if not location:
-             date_text_tag = el.select_one(".em-card_event-text")
-             if date_text_tag and date_text_tag.find_next_sibling(class_="em-card_event-text"):
-                possible_loc_tag = date_text_tag.find_next_sibling(class_="em-card_event-text")
-                if possible_loc_tag and not possible_loc_tag.find('a'):
-                    location = possible_loc_tag.text.strip()
-        print(f"   Location (from list page): {location}")
-
-        # Link from List Page
-        link = title_tag['href'] if title_tag and title_tag.has_attr('href') else None
-        full_link = f"https://events.purdue.edu{link}" if link and link.startswith('/') else link
-        print(f"   Link: {full_link}")
-
-        # Image from List Page
-        img_tag = el.select_one("img")
-        img_src = img_tag['src'] if img_tag and img_tag.has_attr('src') else None
-        full_image = f"https://events.purdue.edu{img_src}" if img_src and img_src.startswith('/') else img_src
-        print(f"   Image: {full_image}")
-
-        # --- Fetch Detail Page for Date and Description ---
-        description = None
-        detail_page_date_str = None # Initialize date string for this event
-
-        if full_link:
-            print(f"   ➡️ Fetching detail page: {full_link}")
-            try:
-                time.sleep(0.3) # Politeness delay
-                detail_response = requests.get(full_link, headers=REQUEST_HEADERS, timeout=15)
-                detail_response.raise_for_status()
-                detail_soup = BeautifulSoup(detail_response.text, 'lxml')
-
-                # --- Extract Date from Detail Page Header ---
-                primary_date_str = None
-                additional_dates_str = None
-                date_container = detail_soup.select_one("div.em-list_dates__container") # Use __
-                if date_container:
-                    primary_date_tag = date_container.select_one("p.em-date")
-                    if primary_date_tag:
-                        primary_date_str = primary_date_tag.get_text(strip=True)
-
-                    extra_dates_msg_tag = date_container.select_one("div.em-list_dates__extra-message") # Use __
-                    if extra_dates_msg_tag and extra_dates_msg_tag.has_attr('aria-label'):
-                        aria_label_text = extra_dates_msg_tag['aria-label']
-                        cleaned_aria_label = re.sub(
-                            r'^(Additional Event Dates:|Additional Event y,|Additional Dates:)\s*', '',
-                            aria_label_text, flags=re.IGNORECASE
-                        ).strip()
-                        if cleaned_aria_label:
-                             additional_dates_str = cleaned_aria_label
-
-                    # Combine Dates
-                    if primary_date_str and additional_dates_str:
-                        detail_page_date_str = f"{primary_date_str}; {additional_dates_str}"
-                    elif primary_date_str:
-                        detail_page_date_str = primary_date_str
-                print(f"   ✅ Date (from detail page): {detail_page_date_str}")
-                # --- End Date Extraction ---
-
-                # --- Extract Description from Detail Page ---
-                description_tag = detail_soup.select_one("div.em-about_description") # Use _
-                if description_tag:
-                    description = description_tag.get_text(separator="\n", strip=True)
-                    print(f"   ✅ Found description (length: {len(description)})")
-                else:
-                    print("   ⚠️ Description element 'div.em-about_description' not found on detail page.")
-                # --- End Description Extraction ---
-
-            except requests.exceptions.RequestException as detail_err:
-                print(f"   ❌ Error fetching detail page {full_link}: {detail_err}")
-            except Exception as parse_err:
-                 print(f"   ❌ Error parsing detail page {full_link}: {parse_err}")
-        else:
-            print("   ⚠️ Skipping detail page fetch: No link found.")
-        # -----------------------------------------
-
-        # --- Append Event Data ---
-        # Use date extracted from detail page
-        events.append({
-            "title": title,
-            "date": detail_page_date_str, # Use date from detail page
-            "location": location, # Still using location from list page card
-            "link": full_link,
-            "image": full_image,
-            "description": description,
-        })
-
-    print(f"\n✅ Extracted {len(events)} events total from scraping phase.")
-    return events
+    return [event.to_prompt_dict() for event in events]
 
 # --- OpenAI Formatting Function ---
 # (Keep the format_events_with_openai function exactly as it was in the previous full script response -
@@ -275,7 +158,7 @@ def main():
     try:
         # --- Scraping ---
         scrape_start_time = time.time()
-        raw_events = fetch_purdue_events()
+        raw_events = fetch_events()
         scrape_time = time.time() - scrape_start_time
         print(f"\n⏱️ Scraping took {scrape_time:.2f} seconds.")
         print(f"📊 Found {len(raw_events)} raw events initially.")
@@ -322,54 +205,28 @@ def main():
             print("--- End Raw String ---")
 
             # --- Attempt to Parse and Validate ---
-            parsed_json = None
-            num_events_received_from_openai = 0
             try:
-                # Clean potential markdown fences
-                if formatted_events_str.strip().startswith("```json"):
-                    formatted_events_str = formatted_events_str.strip()[7:-3].strip()
-                elif formatted_events_str.strip().startswith("```"):
-                     formatted_events_str = formatted_events_str.strip()[3:-3].strip()
-
-                parsed_json = json.loads(formatted_events_str)
-
-                if isinstance(parsed_json, list):
-                    num_events_received_from_openai = len(parsed_json)
-                    print(f"\n✅ Successfully parsed response as a JSON list containing {num_events_received_from_openai} events.")
+                # Parse incrementally so a truncated response still yields its complete events
+                parsed_json, truncated = parse_events_array(formatted_events_str)
+                if not parsed_json:
+                    print("\n❌❌❌ FAILED TO PARSE ANY EVENTS FROM THE OPENAI RESPONSE.")
+                    print("   The raw string received is printed above ('Raw String from OpenAI'). Check it carefully for errors or truncation.")
+                else:
+                    if truncated:
+                        print(f"\n⚠️ WARNING: Response was truncated; salvaged {len(parsed_json)} complete events.")
+                    print(f"\n✅ Successfully parsed {len(parsed_json)} events from the response.")
 
                     # --- CHECK FOR DISCREPANCY ---
-                    if num_events_received_from_openai != num_events_sent_to_openai:
-                        print(f"\n⚠️ WARNING: Sent {num_events_sent_to_openai} events to OpenAI, but received {num_events_received_from_openai} events back in the response!")
-                        print("   This might indicate the response was truncated or the model didn't process all items.")
+                    missing_events = find_missing_events(events_for_batch, parsed_json)
+                    if missing_events:
+                        print(f"\n⚠️ WARNING: Sent {num_events_sent_to_openai} events to OpenAI, but {len(missing_events)} are missing from the response:")
+                        for event in missing_events:
+                            print(f"   - {event_identity(event)}")
                     # --- END CHECK ---
 
                     print("\n✅ Formatted Events (Parsed JSON):\n")
                     print(json.dumps(parsed_json, indent=2))
 
-                elif isinstance(parsed_json, dict):
-                     print("\n⚠️ WARNING: Parsed response is a JSON dictionary, not a list as requested.")
-                     found_list = False
-                     for key, value in parsed_json.items():
-                         if isinstance(value, list):
-                             print(f"   Found a list under the key '{key}'. Processing this list.")
-                             parsed_json = value
-                             num_events_received_from_openai = len(parsed_json)
-                             found_list = True
-                             if num_events_received_from_openai != num_events_sent_to_openai:
-                                print(f"   ⚠️ WARNING: Sent {num_events_sent_to_openai} events to OpenAI, but received {num_events_received_from_openai} events back in the nested list!")
-                             print("\n✅ Formatted Events (Extracted List):\n")
-                             print(json.dumps(parsed_json, indent=2))
-                             break
-                     if not found_list:
-                         print("   Could not find a list within the dictionary response. Displaying the dictionary.")
-                         print(json.dumps(parsed_json, indent=2))
-                else:
-                     print("\n⚠️ WARNING: Parsed response is valid JSON, but not a list or dictionary.")
-                     print(parsed_json)
-
-            except json.JSONDecodeError as json_err:
-                print(f"\n❌❌❌ FAILED TO PARSE OPENAI RESPONSE AS JSON: {json_err}")
-                print("   The raw string received is printed above ('Raw String from OpenAI'). Check it carefully for errors or truncation.")
             except Exception as parse_err:
                  print(f"\n❌ An error occurred processing the OpenAI JSON response: {parse_err}")
                  traceback.print_exc()
@@ -383,8 +240,207 @@ def main():
         total_time = time.time() - total_start_time
         print(f"\n🏁 Script finished in {total_time:.2f} seconds.")
 
+# --- Batch CLI Mode ---
+# Precomputes formatted feeds offline (e.g. from cron) so a static file server can
+# serve them at near-zero cost:
+#
+#   python event-scrapper.py --output-dir feeds/ --format ndjson --concurrency 4 --incremental
+#
+# Exit codes: 0 = every feed written in full, 3 = written but some batches/events failed,
+# 1 = nothing could be written. (2 is left to argparse for usage errors.)
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_PARTIAL = 3
+
+REQUIRED_KEYS_FOR_FORMATTING = ['title', 'date', 'location', 'link', 'description']
+
+def feed_slug(feed_url):
+    """Turns a feed URL into a filesystem-safe snapshot name, e.g. 'events.purdue.edu'."""
+    parsed = urlparse(feed_url)
+    slug = f"{parsed.netloc}{parsed.path}".strip("/")
+    if parsed.query:
+        slug += f"_{parsed.query}"
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", slug) or "feed"
+
+def snapshot_path(output_dir, feed_url, output_format):
+    return os.path.join(output_dir, f"{feed_slug(feed_url)}.{output_format}")
+
+def raw_fingerprint(event):
+    """Hash of the scraped fields formatting depends on; when it changes the event is re-formatted."""
+    return hashlib.sha1(json.dumps([event.get('date'), event.get('description')]).encode("utf-8")).hexdigest()[:16]
+
+def load_snapshot(path):
+    """Reads a previously written snapshot (JSON or NDJSON). Returns a list of events."""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".ndjson"):
+                return [json.loads(line) for line in f if line.strip()]
+            return json.load(f).get("events", [])
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read previous snapshot {path}: {e}")
+        return []
+
+def write_snapshot_atomically(path, feed_url, events, output_format):
+    """Writes to a temp file in the same directory, then renames over the target."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=f".{output_format}", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            if output_format == "ndjson":
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            else:
+                json.dump({
+                    "source": feed_url,
+                    "generated_at": datetime.now().isoformat(timespec="seconds"),
+                    "count": len(events),
+                    "events": events,
+                }, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def format_batch(batch):
+    """Formats one batch and returns (formatted_events, missing_raw_events)."""
+    formatted_events_str, _ = format_events_with_openai(batch)
+    if not formatted_events_str:
+        return [], batch
+    formatted, truncated = parse_events_array(formatted_events_str)
+    if truncated:
+        print(f"⚠️ Batch response was truncated; salvaged {len(formatted)} of {len(batch)} events.")
+    return formatted, find_missing_events(batch, formatted)
+
+def format_all_events(events, batch_size, concurrency):
+    """Formats every event in batches, running at most `concurrency` OpenAI calls at once."""
+    batch_size = batch_size or len(events) or 1
+    batches = [events[i:i + batch_size] for i in range(0, len(events), batch_size)]
+    print(f"📦 Formatting {len(events)} events in {len(batches)} batches (concurrency={concurrency}).")
+    formatted, missing = [], []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(format_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            batch_formatted, batch_missing = future.result()
+            formatted.extend(batch_formatted)
+            missing.extend(batch_missing)
+    return formatted, missing
+
+def run_feed(feed_url, args):
+    """Scrapes, formats and writes one feed. Returns an exit code for that feed."""
+    print(f"\n=== Feed: {feed_url} ===")
+    path = snapshot_path(args.output_dir, feed_url, args.format)
+
+    raw_events = fetch_events(feed_url, args.source_kind, args.requests_per_second)
+    if not raw_events:
+        print(f"❌ No events scraped from {feed_url}; leaving any existing snapshot untouched.")
+        return EXIT_FAILURE
+
+    filtered_events = [e for e in raw_events if all(e.get(key) for key in REQUIRED_KEYS_FOR_FORMATTING)]
+    if args.since:
+        # Events with unparseable dates are kept; the model may still make sense of them.
+        filtered_events = [e for e in filtered_events
+                           if (estimate_card_date(e['date'].split(';')[0], date.today()) or args.since) >= args.since]
+    print(f"✅ Kept {len(filtered_events)} of {len(raw_events)} events after filtering.")
+
+    previous = {}
+    if args.incremental:
+        previous = {event_identity(e): e for e in load_snapshot(path)}
+        print(f"♻️ Reusing up to {len(previous)} events from the previous snapshot.")
+
+    # Reuse only events whose date and description are unchanged, so a rescheduled event is re-formatted.
+    reused, to_format = [], []
+    for e in filtered_events:
+        prev = previous.get(event_identity(e))
+        if prev is not None and prev.get('raw_fingerprint') == raw_fingerprint(e):
+            reused.append(prev)
+        else:
+            to_format.append(e)
+    changed = sum(1 for e in to_format if event_identity(e) in previous)
+    if changed:
+        print(f"🔁 {changed} previously formatted events changed and will be re-formatted.")
+    formatted, missing = format_all_events(to_format, args.batch_size, args.concurrency) if to_format else ([], [])
+    matcher = SentEventMatcher(to_format)
+    for e in formatted:
+        raw = matcher.match(e)
+        if raw is not None:
+            e['raw_fingerprint'] = raw_fingerprint(raw)
+
+    events = reused + formatted
+    if args.since:
+        events = [e for e in events if (parse_display_date(e.get('parsed_date')) or args.since) >= args.since]
+    # Keep feed order stable across runs so diffs between snapshots stay small.
+    order = {event_identity(e): i for i, e in enumerate(filtered_events)}
+    events.sort(key=lambda e: order.get(event_identity(e), len(order)))
+    # The model's urgency is relative to the day it ran, so reused events would carry a stale one.
+    today = date.today()
+    for event in events:
+        event['urgency'] = urgency_for(parse_display_date(event.get('parsed_date')), today)
+
+    if not events:
+        print(f"❌ No formatted events for {feed_url}; not writing a snapshot.")
+        return EXIT_FAILURE
+
+    write_snapshot_atomically(path, feed_url, events, args.format)
+    print(f"💾 Wrote {len(events)} events ({len(reused)} reused, {len(formatted)} newly formatted) to {path}")
+    if missing:
+        print(f"⚠️ {len(missing)} events could not be formatted: {[event_identity(e) for e in missing]}")
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+def parse_since(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--since expects YYYY-MM-DD, got {value!r}")
+
+def cli(argv=None):
+    """Command-line entry point. Without --output-dir, runs the interactive main()."""
+    arg_parser = argparse.ArgumentParser(description="Scrape event feeds and format them with OpenAI.")
+    arg_parser.add_argument("feeds", nargs="*", default=[PURDUE_EVENTS_URL],
+                            help=f"Feed URLs to scrape (default: {PURDUE_EVENTS_URL})")
+    arg_parser.add_argument("--output-dir", help="Write formatted snapshots here (enables batch mode).")
+    arg_parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson")
+    arg_parser.add_argument("--source-kind", choices=sorted(EXTRACTORS), default="purdue",
+                            help="Extractor used for the feed URLs' markup.")
+    arg_parser.add_argument("--requests-per-second", type=float, default=SCRAPE_REQUESTS_PER_SECOND,
+                            help="Max detail-page requests per second per feed.")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="Max concurrent OpenAI calls.")
+    arg_parser.add_argument("--batch-size", type=int, default=EVENT_BATCH_SIZE_FOR_OPENAI,
+                            help="Events per OpenAI call.")
+    arg_parser.add_argument("--since", type=parse_since, help="Only keep events on/after this date (YYYY-MM-DD).")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="Reuse already-formatted events from the previous snapshot when their link, date and description are unchanged.")
+    args = arg_parser.parse_args(argv)
+
+    if not args.output_dir:
+        main()
+        return EXIT_OK
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    start_time = time.time()
+    exit_codes = []
+    for feed_url in args.feeds:
+        try:
+            exit_codes.append(run_feed(feed_url, args))
+        except Exception as err:
+            print(f"❌ Feed {feed_url} failed: {err}")
+            traceback.print_exc()
+            exit_codes.append(EXIT_FAILURE)
+    print(f"\n🏁 Batch finished in {time.time() - start_time:.2f} seconds.")
+
+    if all(code == EXIT_OK for code in exit_codes):
+        return EXIT_OK
+    if all(code == EXIT_FAILURE for code in exit_codes):
+        return EXIT_FAILURE
+    return EXIT_PARTIAL
+
 
 if __name__ == "__main__":
     # Ensure required libraries are installed:
     # pip install requests beautifulsoup4 python-dotenv openai lxml
-    main()
\ No newline at end of file
+    sys.exit(cli())
\ No newline at end of file
@@ -0,0 +1,278 @@
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+
+# --- Local category/tag classifier ---
+# A small TF-IDF + k-nearest-neighbour model trained on events the LLM has already
+# formatted. When it is confident, the event's 'category' and 'tags' are assigned
+# locally and the LLM is told not to generate them, which shortens every completion.
+# Pure Python on purpose: the training set is a few thousand short documents.
+#
+#   python event_classifier.py train    # rebuild the model from the stored history
+#   python event_classifier.py report   # holdout accuracy vs. the LLM's labels
+
+EVENT_HISTORY_PATH = os.getenv("EVENT_HISTORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "formatted_events.jsonl"))
+CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "classifier.json"))
+CLASSIFIER_CONFIDENCE_THRESHOLD = float(os.getenv("CLASSIFIER_CONFIDENCE_THRESHOLD", "0.8"))
+CLASSIFIER_NEIGHBOURS = 7
+MIN_SIMILARITY = 0.15     # Neighbours less similar than this don't vote
+TAG_VOTE_SHARE = 0.4      # A tag needs this share of the neighbour vote to be assigned
+MAX_TAGS = 4
+LABEL_TOKENS_PER_EVENT = 25  # Rough output tokens for "category": ..., "tags": [...] in one event
+
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our that the this to
+was were will with you your we us all more about into their they not can join event
+""".split())
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9]+")
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def event_text(event):
+    """The text the classifier looks at: title weighted double, plus the start of the description."""
+    title = event.get("title") or ""
+    description = (event.get("description") or "")[:600]
+    return f"{title} {title} {event.get('location') or ''} {description}"
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    return {t: w / norm for t, w in vector.items()} if norm else {}
+
+
+class EventClassifier:
+    """TF-IDF vectors with cosine-similarity kNN voting for category and tags."""
+
+    def __init__(self, idf=None, docs=None):
+        self.idf = idf or {}
+        self.docs = docs or []   # [(vector, category, tags)]
+        self._postings = None
+
+    # --- Training ---
+    @classmethod
+    def train(cls, events):
+        labelled = [e for e in events if e.get("category") and isinstance(e.get("tags"), list)]
+        doc_tokens = [tokenize(event_text(e)) for e in labelled]
+        df = Counter()
+        for tokens in doc_tokens:
+            df.update(set(tokens))
+        n_docs = len(labelled)
+        idf = {t: math.log((1 + n_docs) / (1 + c)) + 1 for t, c in df.items()}
+
+        model = cls(idf=idf)
+        for event, tokens in zip(labelled, doc_tokens):
+            vector = model._vectorize_tokens(tokens)
+            if vector:
+                tags = [str(t).lower() for t in event["tags"]]
+                model.docs.append((vector, event["category"], tags))
+        return model
+
+    def _vectorize_tokens(self, tokens):
+        counts = Counter(t for t in tokens if t in self.idf)
+        return _normalize({t: (1 + math.log(c)) * self.idf[t] for t, c in counts.items()})
+
+    def _build_postings(self):
+        postings = defaultdict(list)
+        for doc_id, (vector, _, _) in enumerate(self.docs):
+            for term, weight in vector.items():
+                postings[term].append((doc_id, weight))
+        self._postings = postings
+
+    # --- Prediction ---
+    def neighbours(self, event, k=CLASSIFIER_NEIGHBOURS):
+        """Returns [(similarity, doc_index)] for the k most similar training events."""
+        if self._postings is None:
+            self._build_postings()
+        query = self._vectorize_tokens(tokenize(event_text(event)))
+        scores = defaultdict(float)
+        for term, q_weight in query.items():
+            for doc_id, d_weight in self._postings.get(term, ()):
+                scores[doc_id] += q_weight * d_weight
+        ranked = sorted(((s, d) for d, s in scores.items() if s >= MIN_SIMILARITY), reverse=True)
+        return ranked[:k]
+
+    def predict(self, event):
+        """
+        Returns (category, tags, confidence). confidence is the similarity-weighted share
+        of neighbours agreeing on the category, scaled down when even the best match is weak.
+        """
+        neighbours = self.neighbours(event)
+        if not neighbours:
+            return None, [], 0.0
+
+        category_votes = Counter()
+        tag_votes = Counter()
+        total = 0.0
+        for similarity, doc_id in neighbours:
+            _, category, tags = self.docs[doc_id]
+            category_votes[category] += similarity
+            for tag in tags:
+                tag_votes[tag] += similarity
+            total += similarity
+
+        category, category_score = category_votes.most_common(1)[0]
+        best_similarity = neighbours[0][0]
+        confidence = (category_score / total) * min(1.0, best_similarity / 0.5)
+        tags = [t for t, score in tag_votes.most_common(MAX_TAGS) if score / total >= TAG_VOTE_SHARE]
+        return category, tags, round(confidence, 3)
+
+    # --- Persistence ---
+    def save(self, path=CLASSIFIER_MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"idf": self.idf, "docs": self.docs, "trained_at": time.time()}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CLASSIFIER_MODEL_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(idf=data["idf"], docs=[tuple(doc) for doc in data["docs"]])
+
+
+# --- Formatted-event history (training data) ---
+_history_lock = threading.Lock()
+
+def append_history(events, path=EVENT_HISTORY_PATH):
+    """Appends LLM-labelled events to the history file used for retraining."""
+    if not events:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _history_lock, open(path, "a", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps({
+                "title": event.get("title"),
+                "location": event.get("location"),
+                "description": event.get("description"),
+                "link": event.get("link"),
+                "category": event.get("category"),
+                "tags": event.get("tags"),
+            }, ensure_ascii=False) + "\n")
+
+def load_history(path=EVENT_HISTORY_PATH):
+    """Reads the history, keeping the most recent label for each event link."""
+    if not os.path.exists(path):
+        return []
+    latest = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            latest[event.get("link") or event.get("title")] = event
+    return list(latest.values())
+
+
+# --- Runtime helpers used by the Flask service ---
+_model = None
+_model_mtime = None
+
+def get_classifier():
+    """Returns the trained classifier, reloading it if the model file changed. None if untrained."""
+    global _model, _model_mtime
+    try:
+        mtime = os.path.getmtime(CLASSIFIER_MODEL_PATH)
+    except OSError:
+        return None
+    if _model is None or mtime != _model_mtime:
+        try:
+            _model = EventClassifier.load(CLASSIFIER_MODEL_PATH)
+            _model_mtime = mtime
+            print(f"🧠 Loaded local classifier ({len(_model.docs)} training events).")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not load classifier model {CLASSIFIER_MODEL_PATH}: {e}")
+            return None
+    return _model
+
+def classify_locally(events, threshold=CLASSIFIER_CONFIDENCE_THRESHOLD):
+    """
+    Returns {event_link: (category, tags, confidence)} for events the local model is
+    confident about. Events not in the dict still need the LLM for category/tags.
+    """
+    model = get_classifier()
+    if model is None:
+        return {}
+    confident = {}
+    for event in events:
+        category, tags, confidence = model.predict(event)
+        if category and tags and confidence >= threshold:
+            confident[event.get("link") or event.get("title")] = (category, tags, confidence)
+    return confident
+
+
+# --- Offline training & evaluation ---
+def evaluate(history, threshold=CLASSIFIER_CONFIDENCE_THRESHOLD, holdout_fraction=0.2):
+    """Trains on the oldest events and scores the newest ones against their LLM labels."""
+    split = int(len(history) * (1 - holdout_fraction))
+    train_set, test_set = history[:split], history[split:]
+    model = EventClassifier.train(train_set)
+
+    covered = correct = 0
+    tag_jaccard = 0.0
+    all_correct = 0
+    for event in test_set:
+        category, tags, confidence = model.predict(event)
+        all_correct += category == event.get("category")
+        if category and tags and confidence >= threshold:
+            covered += 1
+            correct += category == event.get("category")
+            expected = {str(t).lower() for t in event.get("tags") or []}
+            union = expected | set(tags)
+            tag_jaccard += len(expected & set(tags)) / len(union) if union else 1.0
+
+    n = len(test_set) or 1
+    return {
+        "train_events": len(train_set),
+        "test_events": len(test_set),
+        "threshold": threshold,
+        "accuracy_all": round(all_correct / n, 3),
+        "coverage": round(covered / n, 3),                      # Share of events labelled locally
+        "accuracy_when_confident": round(correct / covered, 3) if covered else None,
+        "tag_jaccard_when_confident": round(tag_jaccard / covered, 3) if covered else None,
+    }
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Train/evaluate the local event category/tag classifier.")
+    arg_parser.add_argument("command", choices=["train", "report"])
+    arg_parser.add_argument("--history", default=EVENT_HISTORY_PATH)
+    arg_parser.add_argument("--model", default=CLASSIFIER_MODEL_PATH)
+    arg_parser.add_argument("--threshold", type=float, default=CLASSIFIER_CONFIDENCE_THRESHOLD)
+    arg_parser.add_argument("--llm-tokens-per-second", type=float, default=50.0,
+                            help="Model output speed, used to estimate latency saved in the report.")
+    args = arg_parser.parse_args(argv)
+
+    history = load_history(args.history)
+    if not history:
+        print(f"❌ No history found at {args.history}. Run the service for a while first.")
+        return 1
+
+    if args.command == "train":
+        t0 = time.time()
+        model = EventClassifier.train(history)
+        model.save(args.model)
+        print(f"✅ Trained on {len(model.docs)} events in {time.time() - t0:.2f}s -> {args.model}")
+        return 0
+
+    for threshold in sorted({0.5, 0.7, args.threshold, 0.9}):
+        report = evaluate(history, threshold)
+        # Each locally labelled event drops category+tags from the completion.
+        tokens_saved = report["coverage"] * 100 * LABEL_TOKENS_PER_EVENT
+        report["est_completion_tokens_saved_per_100_events"] = round(tokens_saved)
+        report["est_seconds_saved_per_100_events"] = round(tokens_saved / args.llm_tokens_per_second, 1)
+        print(json.dumps(report))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
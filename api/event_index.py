@@ -0,0 +1,95 @@
+import bisect
+import datetime
+import threading
+
+
+# --- Date-sorted urgency/ranking index over a snapshot of formatted events ---
+# Records are sorted once by start date. Urgency buckets are then just index ranges:
+#
+#   [past | high: today..today+3 | medium: ..today+7 | low: later | undated]
+#
+# which bisect finds in O(log n). Ranking (high, medium, then low by date) is the
+# concatenation of those ranges. When the day rolls over only the records that cross a
+# boundary get their urgency reassigned; everything else keeps its bucket.
+
+HIGH_DAYS = 3
+MEDIUM_DAYS = 7
+
+
+class UrgencyIndex:
+    def __init__(self, records):
+        dated = sorted((r for r in records if r.start_date), key=lambda r: r.start_date)
+        undated = [r for r in records if not r.start_date]
+        self.records = dated + undated
+        self._dates = [r.start_date for r in dated]
+        self._as_of = None
+        self._bounds = None      # (past_end, high_end, medium_end) indexes into self.records
+        self._ranked = None
+        self._ranked_dicts = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def _bounds_for(self, today):
+        return (
+            bisect.bisect_left(self._dates, today),
+            bisect.bisect_right(self._dates, today + datetime.timedelta(days=HIGH_DAYS)),
+            bisect.bisect_right(self._dates, today + datetime.timedelta(days=MEDIUM_DAYS)),
+        )
+
+    def _refresh(self, today):
+        """Brings urgency and ranking up to date for `today`. Caller holds the lock."""
+        if today == self._as_of:
+            return
+        new_bounds = self._bounds_for(today)
+        if self._bounds is None:
+            for record in self.records:
+                record.refresh_urgency(today)
+            print(f"🗂️ Built urgency index over {len(self.records)} events as of {today}.")
+        else:
+            # Only records between an old and a new boundary can have changed bucket.
+            changed = 0
+            for old, new in zip(self._bounds, new_bounds):
+                for record in self.records[min(old, new):max(old, new)]:
+                    record.refresh_urgency(today)
+                    changed += 1
+            print(f"🗂️ Day rolled over to {today}: re-bucketed {changed} of {len(self.records)} events.")
+
+        past_end, high_end, medium_end = new_bounds
+        dated_end = len(self._dates)
+        ranked = (self.records[past_end:high_end]          # high
+                  + self.records[high_end:medium_end]      # medium
+                  + self.records[:past_end]                # low: already started/past
+                  + self.records[medium_end:dated_end]     # low: more than a week out
+                  + self.records[dated_end:])              # low: unparseable date
+        for rank, record in enumerate(ranked, start=1):
+            record.ranking = rank
+        self._ranked = ranked
+        self._ranked_dicts = None
+        self._bounds = new_bounds
+        self._as_of = today
+
+    def ranked(self, today=None):
+        """Records in rank order for `today` (default: the current date)."""
+        today = today or datetime.date.today()
+        with self._lock:
+            self._refresh(today)
+            return self._ranked
+
+    def ranked_dicts(self, today=None):
+        """JSON-ready ranked events, serialized once per day rather than per request."""
+        today = today or datetime.date.today()
+        with self._lock:
+            self._refresh(today)
+            if self._ranked_dicts is None:
+                self._ranked_dicts = [record.to_dict() for record in self._ranked]
+            return self._ranked_dicts
+
+    def counts(self, today=None):
+        """Number of events per urgency bucket."""
+        counts = {"high": 0, "medium": 0, "low": 0}
+        for record in self.ranked(today):
+            counts[record.urgency] += 1
+        return counts
+
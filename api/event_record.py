@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import datetime
+import re
+import sys
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+
+# --- Compact typed event records ---
+# One slotted record follows an event from scraping through LLM formatting to the
+# response, instead of a free-form dict that each step re-reads and re-parses.
+# - Slots: no per-instance __dict__, which is most of a small dict's overhead.
+# - category/tags are interned: a handful of distinct values shared by every event.
+# - The start date is parsed once (start_date) and reused for urgency and sorting.
+
+URGENCY_ORDER = {'high': 0, 'medium': 1, 'low': 2}
+DISPLAY_DATE_FORMATS = ("%a, %b %d, %Y", "%b %d, %Y")
+
+# Fields a raw scraped event carries (what the LLM gets as input).
+RAW_FIELDS = ("title", "date", "location", "link", "image", "description")
+
+
+_RANGE_SPLIT_RE = re.compile(r"\s*[-\u2013\u2014]\s*")
+# One end of a range: "Mon, Apr 23, 2025", "Apr 23", "23" or "25, 2025" (weekday, month and year optional).
+_DATE_PART_RE = re.compile(r"^(?:[A-Za-z]{3,9},\s*)?(?:([A-Za-z]{3,9})\.?\s+)?(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?$")
+
+
+def _date_parts(text):
+    """(month, day, year) of one end of a range; month/year are None when not given."""
+    match = _DATE_PART_RE.match(text.strip())
+    if not match:
+        return None
+    month_name, day, year = match.groups()
+    month = None
+    if month_name:
+        try:
+            month = datetime.datetime.strptime(month_name[:3].title(), "%b").month
+        except ValueError:
+            return None
+    return month, int(day), int(year) if year else None
+
+
+def _strptime_date(text):
+    for fmt in DISPLAY_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_display_range(date_text):
+    """
+    Parses a display date ("Mon, May 5, 2025", "May 15, 2025") or range ("Apr 23 - Apr 25, 2025",
+    "Apr 23 - 25, 2025", "Dec 30 - Jan 2, 2026"). A range's start borrows the year, and if
+    needed the month, from its end. Returns (start, end) dates, end == start for a single
+    date, or None if unparseable.
+    """
+    if not date_text:
+        return None
+    single = _strptime_date(date_text.strip())
+    if single:
+        return single, single
+    parts = _RANGE_SPLIT_RE.split(date_text.strip(), maxsplit=1)
+    if len(parts) != 2:
+        return None
+    start, end = _date_parts(parts[0]), _date_parts(parts[1])
+    if not start or not end:
+        return None
+    start_month, end_month = start[0] or end[0], end[0] or start[0]
+    end_year = end[2] or start[2]
+    if not start_month or not end_year:
+        return None
+    start_year = start[2] or (end_year - 1 if (start_month, start[1]) > (end_month, end[1]) else end_year)
+    try:
+        return datetime.date(start_year, start_month, start[1]), datetime.date(end_year, end_month, end[1])
+    except ValueError:
+        return None
+
+
+def parse_display_date(date_text):
+    """Start date of a display date or range (see parse_display_range), or None."""
+    parsed = parse_display_range(date_text)
+    return parsed[0] if parsed else None
+
+
+def urgency_for(start_date, today):
+    """'high' within 3 days (inclusive of today), 'medium' within 7, otherwise 'low'."""
+    if start_date is None:
+        return 'low'
+    days = (start_date - today).days
+    if 0 <= days <= 3:
+        return 'high'
+    if 3 < days <= 7:
+        return 'medium'
+    return 'low'
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True, eq=False)
+class EventRecord:
+    # Scraped fields
+    title: Optional[str] = None
+    date: Optional[str] = None          # Raw date text from the detail page
+    location: Optional[str] = None
+    link: Optional[str] = None
+    image: Optional[str] = None
+    description: Optional[str] = None
+    # LLM-formatted fields
+    parsed_date: Optional[str] = None
+    time: Optional[str] = None
+    additional_days: Optional[int] = None
+    short_description: Optional[str] = None
+    category: Optional[str] = None
+    tags: tuple = ()
+    audience: Optional[str] = None      # "students", "faculty", ... or "all"
+    ranking: Optional[int] = None
+    # Derived by the service
+    start_date: Optional[datetime.date] = None
+    urgency: Optional[str] = None
+    category_source: Optional[str] = None
+    category_confidence: Optional[float] = None
+    image_thumbnail: Optional[str] = None
+    source: Optional[str] = None        # Name of the event source it was scraped from
+    extra: Optional[dict] = field(default=None) # Any unexpected keys the model returned
+
+    def __post_init__(self):
+        self.category = _intern(self.category)
+        self.audience = _intern(self.audience.lower()) if isinstance(self.audience, str) else None
+        self.tags = tuple(_intern(str(t).lower()) for t in self.tags or ())
+        if self.start_date is None and self.parsed_date:
+            self.start_date = parse_display_date(self.parsed_date)
+
+    @property
+    def identity(self):
+        """Key used to match a formatted event back to its raw event."""
+        return self.link or self.title
+
+    def set_labels(self, category, tags):
+        self.category = _intern(category)
+        self.tags = tuple(_intern(str(t).lower()) for t in tags or ())
+
+    def refresh_urgency(self, today):
+        self.urgency = urgency_for(self.start_date, today)
+        return self.urgency
+
+    def sort_key(self):
+        """Urgency (high first), then start date (earliest first, unparseable last)."""
+        return (URGENCY_ORDER.get(self.urgency or 'low', 2), self.start_date or datetime.date.max)
+
+    # --- Conversion ---
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a record from a scraped or LLM-formatted dict; unknown keys go to .extra."""
+        known = {}
+        extra = {}
+        for key, value in data.items():
+            if key in _FIELD_NAMES and key not in _DERIVED_FIELDS:
+                known[key] = value
+            elif key == "calculated_urgency_check":
+                known["urgency"] = value
+            else:
+                extra[key] = value # e.g. the model's own 'urgency' guess
+        if not isinstance(known.get("tags"), (list, tuple)):
+            known["tags"] = ()
+        if not isinstance(known.get("additional_days"), int):
+            known.pop("additional_days", None)
+        return cls(**known, extra=extra or None)
+
+    def to_prompt_dict(self):
+        """The raw fields sent to the LLM, plus category/tags if they were assigned locally."""
+        data = {name: getattr(self, name) for name in RAW_FIELDS}
+        if self.category and self.tags:
+            data["category"] = self.category
+            data["tags"] = list(self.tags)
+        return data
+
+    def to_dict(self):
+        """JSON-ready dict in the shape the API has always returned."""
+        data = {
+            "title": self.title,
+            "date": self.date,
+            "location": self.location,
+            "link": self.link,
+            "image": self.image,
+            "description": self.description,
+            "parsed_date": self.parsed_date,
+            "time": self.time,
+            "short_description": self.short_description,
+            "category": self.category,
+            "tags": list(self.tags),
+            "ranking": self.ranking,
+            "calculated_urgency_check": self.urgency,
+            "category_source": self.category_source,
+            "image_thumbnail": self.image_thumbnail,
+            "source": self.source,
+        }
+        if self.additional_days is not None:
+            data["additional_days"] = self.additional_days
+        if self.audience is not None:
+            data["audience"] = self.audience
+        if self.category_confidence is not None:
+            data["category_confidence"] = self.category_confidence
+        if self.extra:
+            for key, value in self.extra.items():
+                data.setdefault(key, value)
+        return data
+
+
+_FIELD_NAMES = frozenset(f.name for f in fields(EventRecord))
+_DERIVED_FIELDS = frozenset({"start_date", "urgency", "extra"})
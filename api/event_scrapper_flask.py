@@ -1,42 +1,86 @@
 import os
-import requests
 import json
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from openai import OpenAI
 from datetime import date, datetime, timedelta
 import traceback
 import time
-import re # Needed for cleaning aria-label
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import dataclasses
+
+from rate_limit import RateLimiter, SingleFlight, StreamFlight, retry_after_header
+from profiling import profiled, register_profile_routes, is_admin_request
+from event_classifier import classify_locally, append_history
+from image_proxy import register_image, register_image_routes, allow_image_host
+from event_record import EventRecord
+from event_index import UrgencyIndex
+from ics_export import IcsCache, iter_ics, filter_records
+from hedging import LatencyTracker, HedgeStats, hedged_stream
+from source_scheduler import SourceScheduler, sources_from_config
+from json_stream import IncrementalJSONArrayParser, parse_events_array, event_identity, SentEventMatcher
 
 
 # --- Flask Setup ---
-from flask import Flask, jsonify, request
+from flask import Flask, Response, abort, jsonify, request
 from flask_cors import CORS
 
 
 app = Flask(__name__)
-CORS(app, resources={r"/events": {"origins": "http://localhost:8081"}})
+CORS(app, resources={r"/events.*": {"origins": "http://localhost:8081"}})
 
 # --- Configuration ---
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure OpenAI client (reads OPENAI_API_KEY from environment)
-# Initialize lazily or handle potential absence gracefully at startup
+# --- Lazy heavy imports & OpenAI client ---
+# openai (pydantic/httpx), bs4/lxml and requests together dominate import time. They are
+# imported on first use (or by the background warm-up below) so a cold-started instance
+# can answer the '/' health check before paying for them.
 client = None
 openai_init_error = None
-try:
-    client = OpenAI()
-    print("✅ OpenAI client initialized successfully.")
-except Exception as e:
-    openai_init_error = f"❌ Failed to initialize OpenAI client: {e}. Ensure your OPENAI_API_KEY is set in the .env file."
-    print(openai_init_error)
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """
+    Constructs the OpenAI client on first use (reads OPENAI_API_KEY from environment).
+    Returns (client, error_message); error_message is None on success.
+    """
+    global client, openai_init_error
+    if client is not None or openai_init_error is not None:
+        return client, openai_init_error
+    with _openai_client_lock:
+        if client is None and openai_init_error is None:
+            try:
+                from openai import OpenAI
+                client = OpenAI()
+                print("✅ OpenAI client initialized successfully.")
+            except Exception as e:
+                openai_init_error = f"❌ Failed to initialize OpenAI client: {e}. Ensure your OPENAI_API_KEY is set in the .env file."
+                print(openai_init_error)
+    return client, openai_init_error
+
+def warm_up():
+    """Imports the heavy dependencies and builds the OpenAI client ahead of the first /events."""
+    t0 = time.time()
+    import requests # noqa: F401
+    import bs4, lxml # noqa: F401,E401
+    get_openai_client()
+    print(f"🔥 Warm-up finished in {time.time() - t0:.2f}s")
+
+def start_background_warm_up(delay_seconds=None):
+    """Runs warm_up() on a daemon thread after a short delay, so the server can bind and answer first."""
+    delay_seconds = WARM_UP_DELAY_SECONDS if delay_seconds is None else delay_seconds
+    def run():
+        time.sleep(delay_seconds)
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"⚠️ Background warm-up failed: {e}")
+    threading.Thread(target=run, name="warm-up", daemon=True).start()
 
+# Set WARM_UP=0 to skip background warm-up (imports then happen on the first /events).
+WARM_UP = os.getenv("WARM_UP", "1") != "0"
+WARM_UP_DELAY_SECONDS = float(os.getenv("WARM_UP_DELAY_SECONDS", "1.0"))
 
-# URL to scrape
-PURDUE_EVENTS_URL = "https://events.purdue.edu/"
 
 def timed(fn):
     def wrapper(*args, **kwargs):
@@ -56,20 +100,31 @@ MAX_TOKENS_COMPLETION = 4000 # Adjust based on expected output length and model
 # Set to a number (e.g., 15) to limit the batch size.
 EVENT_BATCH_SIZE_FOR_OPENAI = 7 # Keep a reasonable default for API calls
 
-# Browser-like Headers for Requests
-REQUEST_HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
-    'Accept-Language': 'en-US,en;q=0.9',
-    'Accept-Encoding': 'gzip, deflate, br',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1',
-    'Sec-Fetch-Dest': 'document',
-    'Sec-Fetch-Mode': 'navigate',
-    'Sec-Fetch-Site': 'none',
-    'Sec-Fetch-User': '?1',
-    'Cache-Control': 'max-age=0',
-}
+# Stream completions (stream=True) and post-process each event as soon as it is complete.
+# Set OPENAI_STREAMING=0 to fall back to waiting for the whole completion.
+OPENAI_STREAMING = os.getenv("OPENAI_STREAMING", "1") != "0"
+
+# Per-call deadline for OpenAI formatting, and hedging: if a call has produced nothing by
+# the observed p90 latency, a duplicate is fired and the first to answer wins. If the
+# deadline is too close for another call at the usual latency, the duplicate uses
+# OPENAI_FALLBACK_MODEL (if set) instead. See hedging.py.
+OPENAI_DEADLINE_SECONDS = float(os.getenv("OPENAI_DEADLINE_SECONDS", "45"))
+OPENAI_HEDGING = os.getenv("OPENAI_HEDGING", "1") != "0"
+OPENAI_HEDGE_PERCENTILE = float(os.getenv("OPENAI_HEDGE_PERCENTILE", "90"))
+OPENAI_FALLBACK_MODEL = os.getenv("OPENAI_FALLBACK_MODEL") or None # e.g. "gpt-4o-mini"
+
+# Rate limits for /events (requests per minute, plus how many may arrive at once).
+EVENTS_RATE_PER_CLIENT_PER_MIN = float(os.getenv("EVENTS_RATE_PER_CLIENT_PER_MIN", "6"))
+EVENTS_BURST_PER_CLIENT = int(os.getenv("EVENTS_BURST_PER_CLIENT", "3"))
+EVENTS_RATE_GLOBAL_PER_MIN = float(os.getenv("EVENTS_RATE_GLOBAL_PER_MIN", "120"))
+EVENTS_BURST_GLOBAL = int(os.getenv("EVENTS_BURST_GLOBAL", "60"))
+# Number of reverse proxies in front of the app that append to X-Forwarded-For. With 0
+# (the default) the header is ignored, since any caller can set it to dodge the limit.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+# How long a formatted snapshot is served before /events scrapes again.
+EVENTS_CACHE_TTL_SECONDS = int(os.getenv("EVENTS_CACHE_TTL_SECONDS", str(30 * 60)))
+
 
 # --- Helper to parse relative dates/calculate urgency ---
 def calculate_urgency_and_parse_date(date_str, today):
@@ -127,154 +182,17 @@ def calculate_urgency_and_parse_date(date_str, today):
 
     return parsed_date, urgency # Note: This function doesn't handle time extraction, LLM does.
 
-# --- Web Scraping Function ---
-@timed
-def fetch_purdue_events():
-    """
-    Scrapes raw event data from Purdue Events.
-    - Gets Title, Link, Image, Location (basic) from the main list page.
-    - Visits each event's detail page to get Date (from header) and Description.
-    """
-    print(f"🟡 Requesting data from {PURDUE_EVENTS_URL}...")
-    try:
-        list_response = requests.get(PURDUE_EVENTS_URL, headers=REQUEST_HEADERS, timeout=20)
-        list_response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error fetching list URL {PURDUE_EVENTS_URL}: {e}")
-        return [], f"Error fetching event list: {e}"
-
-    print("🟢 Successfully fetched event list HTML. Parsing...")
-    list_soup = BeautifulSoup(list_response.text, 'lxml')
-    events = []
-    event_cards = list_soup.select(".em-card")
-    print(f"🔍 Found {len(event_cards)} potential event cards on the main page.")
-    event_count = 0
-
-    for el in event_cards:
-        event_count += 1
-        # print(f"\n--- Processing card {event_count}/{len(event_cards)} ---") # Too verbose for logs
-
-        # --- Extract basic info from List Page Card (el) ---
-        title_tag = el.select_one(".em-card_title a")
-        title = title_tag.text.strip() if title_tag else None
-
-        if not title:
-            # print("   Skipping card: No title found.") # Too verbose
-            continue
-        # print(f"   Title: {title}") # Too verbose
-
-        # Location from List Page (basic attempt)
-        location_tag = el.select_one(".em-card_event-text a")
-        location = location_tag.text.strip() if location_tag else None
-        if not location:
-            # Sometimes location is not a link but just text after date
-             date_text_tag = el.select_one(".em-card_event-text")
-             if date_text_tag and date_text_tag.find_next_sibling(class_="em-card_event-text"):
-                possible_loc_tag = date_text_tag.find_next_sibling(class_="em-card_event-text")
-                if possible_loc_tag and not possible_loc_tag.find('a'): # Ensure it's not another link (like time)
-                    location = possible_loc_tag.text.strip()
-        # print(f"   Location (from list page): {location}") # Too verbose
-
-        # Link from List Page
-        link = title_tag['href'] if title_tag and title_tag.has_attr('href') else None
-        full_link = f"https://events.purdue.edu{link}" if link and link.startswith('/') else link
-        # print(f"   Link: {full_link}") # Too verbose
-
-        # Image from List Page
-        img_tag = el.select_one("img")
-        img_src = img_tag['src'] if img_tag and img_tag.has_attr('src') else None
-        full_image = f"https://events.purdue.edu{img_src}" if img_src and img_src.startswith('/') else img_src
-        # print(f"   Image: {full_image}") # Too verbose
-
-        # --- Fetch Detail Page for Date and Description ---
-        description = None
-        detail_page_date_str = None # Initialize date string for this event
-
-        if full_link:
-            # print(f"   ➡️ Fetching detail page: {full_link}") # Too verbose
-            try:
-                # time.sleep(0.1) # Politeness delay - slightly reduced for potential web service use
-                detail_response = requests.get(full_link, headers=REQUEST_HEADERS, timeout=15)
-                detail_response.raise_for_status()
-                detail_soup = BeautifulSoup(detail_response.text, 'lxml')
-
-                # --- Extract Date from Detail Page Header ---
-                primary_date_str = None
-                additional_dates_str = None
-                date_container = detail_soup.select_one("div.em-list_dates__container")
-                if date_container:
-                    primary_date_tag = date_container.select_one("p.em-date")
-                    if primary_date_tag:
-                        primary_date_str = primary_date_tag.get_text(strip=True)
-
-                    # Extracting additional dates from aria-label
-                    extra_dates_msg_tag = date_container.select_one("div.em-list_dates__extra-message")
-                    if extra_dates_msg_tag and extra_dates_msg_tag.has_attr('aria-label'):
-                        aria_label_text = extra_dates_msg_tag['aria-label']
-                        # Use regex to clean potential prefixes
-                        cleaned_aria_label = re.sub(
-                            r'^(Additional Event Dates:|Additional Event y,|Additional Dates:)\s*', '',
-                            aria_label_text, flags=re.IGNORECASE
-                        ).strip()
-                        if cleaned_aria_label:
-                             additional_dates_str = cleaned_aria_label
-
-                    # Combine Dates
-                    if primary_date_str and additional_dates_str:
-                        detail_page_date_str = f"{primary_date_str}; {additional_dates_str}"
-                    elif primary_date_str:
-                        detail_page_date_str = primary_date_str
-                # print(f"   ✅ Date (from detail page): {detail_page_date_str}") # Too verbose
-                # --- End Date Extraction ---
-
-                # --- Extract Description from Detail Page ---
-                description_tag = detail_soup.select_one("div.em-about_description")
-                if description_tag:
-                    description = description_tag.get_text(separator="\n", strip=True)
-                    # print(f"   ✅ Found description (length: {len(description)})") # Too verbose
-                else:
-                    # print("   ⚠️ Description element 'div.em-about_description' not found on detail page.") # Too verbose
-                    pass # Allow events without description to pass scraping, filter later
-                # --- End Description Extraction ---
-
-            except requests.exceptions.RequestException as detail_err:
-                print(f"   ❌ Error fetching detail page {full_link}: {detail_err}")
-            except Exception as parse_err:
-                 print(f"   ❌ Error parsing detail page {full_link}: {parse_err}")
-        # else:
-            # print("   ⚠️ Skipping detail page fetch: No link found.") # Too verbose
-        # -----------------------------------------
-
-        # --- Append Event Data ---
-        # Use date extracted from detail page
-        events.append({
-            "title": title,
-            "date": detail_page_date_str, # Use date from detail page
-            "location": location, # Still using location from list page card
-            "link": full_link,
-            "image": full_image,
-            "description": description,
-        })
-
-    print(f"\n✅ Extracted {len(events)} events total from scraping phase.")
-    return events, None # Return events list and None for error
+# --- Event sources ---
+# Scraping lives in sources.py (one extractor per calendar site) and is run by the
+# scheduler below: all sources concurrently, each with its own rate limit, cache and
+# health status (see /sources).
+source_scheduler = SourceScheduler(sources_from_config(os.getenv("EVENT_SOURCES")))
+for _source in source_scheduler.sources:
+    allow_image_host(_source.url) # Thumbnails for every configured site go through the proxy
 
 # --- OpenAI Formatting Function ---
-@timed
-def format_events_with_openai(events_to_process):
-    """Formats scraped event data using OpenAI GPT, including summarizing descriptions."""
-
-    if openai_init_error:
-        print("❌ OpenAI client not initialized. Skipping formatting.")
-        return None, 0, openai_init_error
-
-    num_events_sending = len(events_to_process)
-    print(f"🤖 Formatting {num_events_sending} events with OpenAI...")
-
-    if not events_to_process:
-        print("   No events to format.")
-        return None, 0, None # Return None for content, 0 for count sent, None for error
-
+def build_formatting_messages(events_to_process):
+    """Builds the chat messages asking the model to format the given raw events."""
     today_str = date.today().strftime("%a, %b %d, %Y")
 
     # Construct the prompt for OpenAI
@@ -296,29 +214,52 @@ Your task is to process the following JSON input array:
     - 'category': Guess a relevant category from the title and description (e.g., "Seminar", "Music", "Career Fair", "Workshop", "Arts", "Sports", "Social", "Lecture", "Expo", "Commencement"). Use "General" if unsure.
     - -'ranking' : Once you’ve built all objects, **sort them by urgency** (high→medium→low) & importance, then **assign it to ranking `"ranking"`**: 1 for highest urgency, 2 for next, etc.
     - 'tags': Generate 2-4 relevant lowercase keywords based on title, category, and description.
+    - 'audience': Who the event is for, one of "students", "faculty", "staff", "alumni", "public" or "all". Use "all" if unsure.
+    - 'additional_days': For an event that runs on consecutive days (e.g. "Apr 23 - Apr 25, 2025"), the number of days after the first one (2 in that example). Use 0 for a single-day event.
+  - If an input event already has both 'category' and 'tags', they were assigned in advance: do NOT output 'category' or 'tags' for that event.
 
 Return ONLY a valid JSON array containing the formatted event objects for ALL the events provided in the input. Do NOT include any introduction, explanation, markdown formatting (like ```json), or concluding remarks. Ensure the output is a single, complete JSON array.
 The output should be arranged according to the urgency ('high' first, then 'medium', then 'low'), and then by parsed_date (earliest first).
-Input JSON ({num_events_sending} events):
-{json.dumps(events_to_process, indent=2)}
+Input JSON ({len(events_to_process)} events):
+{json.dumps([event.to_prompt_dict() for event in events_to_process], indent=2)}
 """
 
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert event data formatter. You receive event data, enhance it by parsing dates, summarizing descriptions, adding categories/urgency/tags, and return ONLY a valid JSON array containing objects for all input events, sorted by urgency and date."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+@timed
+def format_events_with_openai(events_to_process, model=None, timeout=None):
+    """Formats scraped event data using OpenAI GPT, including summarizing descriptions."""
+    model = model or OPENAI_MODEL
+
+    client, openai_init_error = get_openai_client()
+    if openai_init_error:
+        print("❌ OpenAI client not initialized. Skipping formatting.")
+        return None, 0, openai_init_error
+
+    num_events_sending = len(events_to_process)
+    print(f"🤖 Formatting {num_events_sending} events with OpenAI...")
+
+    if not events_to_process:
+        print("   No events to format.")
+        return None, 0, None # Return None for content, 0 for count sent, None for error
+
     try:
-        print(f"   Sending request to OpenAI API ({OPENAI_MODEL})...")
+        print(f"   Sending request to OpenAI API ({model})...")
         completion = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert event data formatter. You receive event data, enhance it by parsing dates, summarizing descriptions, adding categories/urgency/tags, and return ONLY a valid JSON array containing objects for all input events, sorted by urgency and date."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            model=model,
+            messages=build_formatting_messages(events_to_process),
             temperature=0.2,
             max_tokens=MAX_TOKENS_COMPLETION,
+            timeout=timeout,
             # response_format={ "type": "json_object" } # KEEP THIS COMMENTED OUT as it can cause issues
         )
         print("   Received response from OpenAI.")
@@ -350,42 +291,147 @@ Input JSON ({num_events_sending} events):
         return None, num_events_sending, f"Error calling OpenAI API: {e}"
 
 
-# --- Flask Routes ---
+def close_when_set(stop, stream):
+    """Closes `stream` once `stop` is set, unblocking a read that is still waiting on the server."""
+    stop.wait()
+    stream.close()
 
-@app.route('/')
-def index():
-    """Root endpoint."""
-    status = "Operational" if client else "Degraded (OpenAI client failed to initialize)"
-    message = "Purdue Events Scraper and Formatter Service"
+def stream_events_with_openai(events_to_process, status, model=None, timeout=None, stop=None):
+    """
+    Streaming variant of format_events_with_openai: calls the API with stream=True and
+    yields each formatted event object as soon as the model has finished writing it.
+    Fills `status` with 'sent', 'finish_reason', 'truncated' and 'error' (None on success).
+    When the optional `stop` event is set (a hedge lost the race), the stream is closed
+    right away, mid-object or while still waiting for the first chunk.
+    """
+    model = model or OPENAI_MODEL
+    status.update({"sent": len(events_to_process), "finish_reason": None, "truncated": False, "error": None})
+
+    client, openai_init_error = get_openai_client()
     if openai_init_error:
-        message += f"\nWARNING: {openai_init_error}"
-    return jsonify({"status": status, "message": message})
+        print("❌ OpenAI client not initialized. Skipping formatting.")
+        status["error"] = openai_init_error
+        return
 
-@app.route('/events', methods=['GET'])
-def get_events():
+    if not events_to_process:
+        print("   No events to format.")
+        return
+
+    print(f"🤖 Streaming {len(events_to_process)} events through OpenAI ({model})...")
+    parser = IncrementalJSONArrayParser()
+    t0 = time.time()
+    first_event_at = None
+    stream = None
+    try:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=build_formatting_messages(events_to_process),
+            temperature=0.2,
+            max_tokens=MAX_TOKENS_COMPLETION,
+            stream=True,
+            timeout=timeout,
+        )
+        if stop is not None:
+            threading.Thread(target=close_when_set, args=(stop, stream), name="openai-stream-closer", daemon=True).start()
+        for chunk in stream:
+            if stop is not None and stop.is_set():
+                break
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason:
+                status["finish_reason"] = choice.finish_reason
+            text = choice.delta.content if choice.delta else None
+            for event in parser.feed(text):
+                if first_event_at is None:
+                    first_event_at = time.time() - t0
+                    print(f"   ⏱ First event arrived after {first_event_at:.2f}s")
+                yield EventRecord.from_dict(event)
+    except Exception as e:
+        if stop is not None and stop.is_set():
+            status["error"] = "Abandoned: another attempt answered first."
+            return
+        print(f"❌ Error streaming from OpenAI API: {e}")
+        traceback.print_exc()
+        status["error"] = f"Error calling OpenAI API: {e}"
+        # Fall through: events already yielded are kept, the caller decides what to do.
+    finally:
+        if stream is not None:
+            stream.close() # Also runs when a losing hedge is abandoned mid-stream
+
+    if stop is not None and stop.is_set():
+        status["error"] = status["error"] or "Abandoned: another attempt answered first."
+        return
+    for event in parser.close():
+        yield EventRecord.from_dict(event)
+
+    status["truncated"] = not (parser.complete or parser.used_fallback)
+    if status["finish_reason"] == 'length':
+        print("   ⚠️ WARNING: OpenAI stopped generating due to reaching max_tokens (finish_reason='length'). Output is likely incomplete.")
+    if parser.errors:
+        print(f"   ⚠️ Skipped {len(parser.errors)} malformed event objects in the stream.")
+    if not parser.count and not status["error"]:
+        status["raw_response"] = parser.raw_text
+    print(f"✅ OpenAI stream finished in {time.time() - t0:.2f}s with {parser.count} events (finish_reason={status['finish_reason']}).")
+
+
+def iter_completed_events(events_to_process, status, model=None, timeout=None, stop=None):
     """
-    Endpoint to trigger the event scraping and formatting process.
-    Returns a JSON array of formatted events.
+    Non-streaming fallback with the same interface as stream_events_with_openai. A
+    non-streamed request can't be interrupted, so a stopped attempt only skips parsing.
     """
-    print("\n--- Received request to /events ---")
-    t_start = time.time()
-    total_start_time = time.time()
+    response_str, num_sent, openai_error = format_events_with_openai(events_to_process, model, timeout)
+    status.update({"sent": num_sent, "finish_reason": None, "truncated": False, "error": openai_error})
+    if stop is not None and stop.is_set():
+        return
+    if openai_error or not response_str:
+        return
+    events, status["truncated"] = parse_events_array(response_str)
+    if not events:
+        status["raw_response"] = response_str
+    for event in events:
+        yield EventRecord.from_dict(event)
+
+
+openai_latency = LatencyTracker()
+hedge_stats = HedgeStats()
+
+def format_events_hedged(events_to_process, status):
+    """
+    Runs the configured formatter under OPENAI_DEADLINE_SECONDS, hedging slow calls.
+    Same interface as stream_events_with_openai, plus 'hedged', 'model' and
+    'deadline_exceeded' in `status`.
+    """
+    formatter = stream_events_with_openai if OPENAI_STREAMING else iter_completed_events
+    if not events_to_process:
+        return formatter(events_to_process, status)
+    return hedged_stream(
+        lambda model, attempt_status, timeout, stop: formatter(events_to_process, attempt_status, model, timeout, stop),
+        status, openai_latency, hedge_stats, OPENAI_DEADLINE_SECONDS,
+        primary_model=OPENAI_MODEL, fallback_model=OPENAI_FALLBACK_MODEL,
+        hedge_percentile=OPENAI_HEDGE_PERCENTILE, hedging=OPENAI_HEDGING,
+    )
 
-    # --- Scraping ---
+
+# --- Pipeline helpers shared by the routes ---
+def scrape_and_filter_events():
+    """
+    Scrapes the site and keeps only events complete enough to send to the LLM.
+    Returns (raw_events, filtered_events, scrape_error).
+    """
     scrape_start_time = time.time()
-    raw_events, scrape_error = fetch_purdue_events()
+    raw_events, source_errors = source_scheduler.scrape_all()
+    scrape_error = None
+    if source_errors:
+        for name, error in source_errors.items():
+            print(f"⚠️ Source {name} failed: {error}")
+        if not raw_events:
+            scrape_error = "; ".join(f"{name}: {error}" for name, error in source_errors.items())
     scrape_time = time.time() - scrape_start_time
     print(f"\n⏱️ Scraping took {scrape_time:.2f} seconds.")
     print(f"📊 Found {len(raw_events)} raw events initially.")
-
     if scrape_error:
-        return jsonify({"status": "error", "message": scrape_error, "step": "scraping"}), 500
-
-    if not raw_events:
-        print("⏹️ No events were scraped.")
-        total_time = time.time() - total_start_time
-        print(f"🏁 Request finished in {total_time:.2f} seconds.")
-        return jsonify({"status": "success", "message": "No events found to process.", "events": []})
+        return raw_events, [], scrape_error
 
     # --- Filtering ---
     print("\n🔍 Filtering events to keep only those with complete details...")
@@ -395,224 +441,424 @@ def get_events():
     required_keys_for_formatting = ['title', 'date', 'link', 'description']
     for event in raw_events:
         # Check if required keys exist AND their values are not None/empty string
-        if all(event.get(key) for key in required_keys_for_formatting):
+        if all(getattr(event, key) for key in required_keys_for_formatting):
              # Ensure description is not just whitespace
-             if event.get('description', '').strip():
+             if event.description.strip():
                  filtered_events.append(event)
 
-
     print(f"✅ Kept {len(filtered_events)} events after filtering for formatting.")
+    return raw_events, filtered_events, None
 
-    if not filtered_events:
-        print("⏹️ No events with complete details found to format.")
-        total_time = time.time() - total_start_time
-        print(f"🏁 Request finished in {total_time:.2f} seconds.")
-        return jsonify({"status": "success", "message": "No events with complete details found to format.", "events": []})
-
-
-    # --- Prepare Batch for OpenAI ---
+def select_batch(filtered_events):
+    """Applies EVENT_BATCH_SIZE_FOR_OPENAI to the filtered events (already most urgent first)."""
     if EVENT_BATCH_SIZE_FOR_OPENAI is not None:
         events_for_batch = filtered_events[:EVENT_BATCH_SIZE_FOR_OPENAI]
-        print(f"📦 Selecting first {len(events_for_batch)} events based on BATCH_SIZE = {EVENT_BATCH_SIZE_FOR_OPENAI}.")
+        print(f"📦 Selecting the {len(events_for_batch)} most urgent events based on BATCH_SIZE = {EVENT_BATCH_SIZE_FOR_OPENAI}.")
     else:
         events_for_batch = filtered_events
         print(f"📦 Processing all {len(events_for_batch)} filtered events in one batch.")
+    return events_for_batch
+
+def iter_postprocessed_events(events_for_batch, status):
+    """
+    Yields formatted, urgency-checked events as soon as each one is available, then
+    re-requests any events the model dropped (once). Fills `status` like
+    stream_events_with_openai, plus 'missing' (raw events never returned).
+    """
+    formatter = format_events_hedged
+    today = date.today()
+
+    # Category/tags the local classifier is confident about are sent pre-filled,
+    # so the model skips generating them.
+    local_labels = classify_locally([event.to_prompt_dict() for event in events_for_batch])
+    if local_labels:
+        print(f"🧠 Local classifier labelled {len(local_labels)}/{len(events_for_batch)} events.")
+    events_to_send = [with_local_labels(e, local_labels) for e in events_for_batch]
+    matcher = SentEventMatcher(events_to_send)
+    received = []
+    received_ids = set() # id() of sent events that already have a formatted record
+
+    def accept(event, retrying=False):
+        """Ties a formatted event to the event it was sent as; False for a repeat of one already received."""
+        sent = matcher.match(event)
+        if sent is None:
+            if retrying:
+                return False # Can't tell which missing event it is, so it could duplicate one already shown
+        elif id(sent) in received_ids:
+            print(f"   ↩️ Dropping duplicate of already received event: {sent.identity}")
+            return False
+        else:
+            received_ids.add(id(sent))
+            event.link = sent.link or event.link # Keep the scraped link, the model sometimes rewrites it
+            event.source = sent.source # The model never sees or echoes this
+        apply_local_labels(event, local_labels, sent.identity if sent else None)
+        event.refresh_urgency(today)
+        apply_image_proxy(event)
+        received.append(event)
+        return True
+
+    for event in formatter(events_to_send, status):
+        if accept(event):
+            yield event
+
+    missing_events = [e for e in events_to_send if id(e) not in received_ids] if received else []
+    if missing_events and not status.get("error"):
+        print(f"\n⚠️ WARNING: Sent {len(events_for_batch)} events to OpenAI, but {len(missing_events)} are missing from the response. Re-requesting them...")
+        retry_status = {}
+        for event in formatter(missing_events, retry_status):
+            if accept(event, retrying=True):
+                yield event
+        if retry_status.get("error"):
+            print(f"   ❌ Re-request failed: {retry_status['error']}")
+        missing_events = [e for e in missing_events if id(e) not in received_ids]
+        if missing_events:
+            print(f"   ⚠️ Still missing {len(missing_events)} events after re-request.")
+    status["missing"] = missing_events
+    status["received"] = len(received)
+    status["labelled_locally"] = len(local_labels)
+
+    # LLM-labelled events become training data for the next classifier retrain.
+    try:
+        append_history([e.to_dict() for e in received if e.category_source == "llm"])
+    except OSError as e:
+        print(f"⚠️ Could not append to event history: {e}")
+
+def with_local_labels(event, local_labels):
+    """Copy of a raw event with locally predicted category/tags filled in, if any."""
+    label = local_labels.get(event.identity)
+    if not label:
+        return event
+    category, tags, _ = label
+    labelled = dataclasses.replace(event)
+    labelled.set_labels(category, tags)
+    return labelled
+
+def apply_image_proxy(event):
+    """Adds 'image_thumbnail', a /images/<id> path serving a resized, cached copy (add ?w=160|320|640)."""
+    try:
+        event.image_thumbnail = register_image(event.image)
+    except OSError as e:
+        print(f"⚠️ Could not register image for proxying: {e}")
+        event.image_thumbnail = None
+    return event
+
+def apply_local_labels(event, local_labels, identity=None):
+    """Sets category/tags on a formatted event from the local classifier, or marks them as LLM output."""
+    label = local_labels.get(identity or event.identity)
+    if label:
+        category, tags, event.category_confidence = label
+        event.set_labels(category, tags)
+        event.category_source = "local"
+    else:
+        event.category_source = "llm"
+    return event
+
+
+def run_events_pipeline():
+    """
+    Scrapes, filters, formats and sorts events.
+    Returns (response_payload, http_status) so concurrent /events requests can share one run.
+    """
+    total_start_time = time.time()
+
+    # --- Scraping & Filtering ---
+    raw_events, filtered_events, scrape_error = scrape_and_filter_events()
+    if scrape_error:
+        return {"status": "error", "message": scrape_error, "step": "scraping"}, 500
+
+    if not raw_events:
+        print("⏹️ No events were scraped.")
+        total_time = time.time() - total_start_time
+        print(f"🏁 Request finished in {total_time:.2f} seconds.")
+        return {"status": "success", "message": "No events found to process.", "events": []}, 200
+
+    if not filtered_events:
+        print("⏹️ No events with complete details found to format.")
+        total_time = time.time() - total_start_time
+        print(f"🏁 Request finished in {total_time:.2f} seconds.")
+        return {"status": "success", "message": "No events with complete details found to format.", "events": []}, 200
 
+    # --- Prepare Batch for OpenAI ---
+    events_for_batch = select_batch(filtered_events)
 
-    # --- OpenAI Formatting ---
+    # --- OpenAI Formatting + post-processing, one event at a time ---
     format_start_time = time.time()
-    formatted_events_str, num_events_sent_to_openai, openai_error = format_events_with_openai(events_for_batch)
+    status = {}
+    formatted_events = list(iter_postprocessed_events(events_for_batch, status))
     format_time = time.time() - format_start_time
     print(f"⏱️ OpenAI Formatting took {format_time:.2f} seconds.")
 
-    if openai_error:
-         return jsonify({"status": "error", "message": openai_error, "step": "openai_call"}), 500
-    
-    t_end = time.time()
-    print(f"⏱ Total /events handler took {t_end - t_start:.2f}s")
-
-    # --- Process Response ---
-    parsed_json = None
-    if formatted_events_str:
-        # print("\n--- Formatted Events (Raw String from OpenAI) ---") # Avoid printing large strings to console in web service
-        # print(formatted_events_str)
-        # print("--- End Raw String ---")
-
-        # --- Attempt to Parse and Validate ---
-        num_events_received_from_openai = 0
-        try:
-            # Clean potential markdown fences
-            if formatted_events_str.strip().startswith("```json"):
-                formatted_events_str = formatted_events_str.strip()[7:-3].strip()
-            elif formatted_events_str.strip().startswith("```"):
-                 formatted_events_str = formatted_events_str.strip()[3:-3].strip()
-
-            parsed_json = json.loads(formatted_events_str)
-
-            if isinstance(parsed_json, list):
-                num_events_received_from_openai = len(parsed_json)
-                print(f"\n✅ Successfully parsed response as a JSON list containing {num_events_received_from_openai} events.")
-
-                # --- CHECK FOR DISCREPANCY ---
-                if num_events_received_from_openai != num_events_sent_to_openai:
-                    print(f"\n⚠️ WARNING: Sent {num_events_sent_to_openai} events to OpenAI, but received {num_events_received_from_openai} events back in the response!")
-                    print("   This might indicate the response was truncated or the model didn't process all items.")
-                # --- END CHECK ---
-
-                # --- Add a simple urgency check/sort fallback ---
-                # The LLM is asked to provide urgency and sort, but we can add a basic
-                # check/sort here based on the LLM's 'parsed_date' and 'urgency' fields
-                # as a safeguard or alternative sorting if needed.
-                today = date.today()
-                for event in parsed_json:
-                     # Recalculate urgency based on LLM's parsed_date as a check/fallback
-                     # This requires parsing LLM's parsed_date format.
-                     llm_parsed_date_str = event.get('parsed_date')
-                     if llm_parsed_date_str:
-                         try:
-                             # Attempt to parse LLM's parsed_date format "Mon, May 5, 2025" or "May 15, 2025" etc.
-                             # This is still a simplification; a robust date parser is recommended.
-                             date_part = llm_parsed_date_str.split(' - ')[0] # Take the start date if it's a range
-                             event_date_obj = None
-                             for fmt in ["%a, %b %d, %Y", "%b %d, %Y"]:
-                                 try:
-                                     event_date_obj = datetime.strptime(date_part, fmt).date()
-                                     break
-                                 except ValueError:
-                                     continue
-
-                             if event_date_obj:
-                                 delta = event_date_obj - today
-                                 if 0 <= delta.days <= 3:
-                                     event['calculated_urgency_check'] = 'high'
-                                 elif 3 < delta.days <= 7:
-                                     event['calculated_urgency_check'] = 'medium'
-                                 else:
-                                     event['calculated_urgency_check'] = 'low'
-                             else:
-                                event['calculated_urgency_check'] = 'low' # Could not parse LLM's date for check
-                                print(f"⚠️ Could not parse LLM's parsed_date '{llm_parsed_date_str}' for urgency check.")
-
-                         except Exception as e:
-                             print(f"⚠️ Error during post-LLM urgency calculation for '{llm_parsed_date_str}': {e}")
-                             event['calculated_urgency_check'] = 'low' # Default on error
-
-                # Optional: Re-sort the list based on urgency and parsed_date
-                # This is a simple sort and might not handle date ranges perfectly.
-                urgency_order = {'high': 0, 'medium': 1, 'low': 2}
-                def sort_key(event):
-                    #  urgency_val = urgency_order.get(event.get('urgency', 'low'), 2)
-                    #  # Try to parse date for sorting (using LLM's parsed_date)
-                    #  date_val = datetime.max.date() # Default to future if parsing fails
-                    #  llm_parsed_date_str = event.get('parsed_date')
-                    #  if llm_parsed_date_str:
-                    #       try:
-                    #           date_part = llm_parsed_date_str.split(' - ')[0]
-                    #           # Attempt to parse common formats
-                    #           for fmt in ["%a, %b %d, %Y", "%b %d, %Y"]:
-                    #               try:
-                    #                   date_val = datetime.strptime(date_part, fmt).date()
-                    #                   break
-                    #               except ValueError:
-                    #                   continue
-                    #       except Exception:
-                    #          pass # Keep default date_val if parsing fails
-
-                    #  return (urgency_val, date_val)
-
-                 parsed_json.sort(key=sort_key)
-                print("✅ Sorted events by urgency and date.")
-                # --- End urgency check/sort fallback ---
-
-
-            elif isinstance(parsed_json, dict):
-                print("\n⚠️ WARNING: Parsed response is a JSON dictionary, not a list as requested.")
-                found_list = False
-                # Attempt to find a list within the dictionary
-                for key, value in parsed_json.items():
-                    if isinstance(value, list):
-                        print(f"   Found a list under the key '{key}'. Using this list.")
-                        parsed_json = value
-                        num_events_received_from_openai = len(parsed_json)
-                        found_list = True
-                        if num_events_received_from_openai != num_events_sent_to_openai:
-                             print(f"   ⚠️ WARNING: Sent {num_events_sent_to_openai} events to OpenAI, but received {num_events_received_from_openai} events back in the nested list!")
-                        # Re-sort the extracted list (see sorting logic above)
-                        urgency_order = {'high': 0, 'medium': 1, 'low': 2}
-                        def sort_key(event):
-                             urgency_val = urgency_order.get(event.get('urgency', 'low'), 2)
-                             date_val = datetime.max.date()
-                             llm_parsed_date_str = event.get('parsed_date')
-                             if llm_parsed_date_str:
-                                  try:
-                                      date_part = llm_parsed_date_str.split(' - ')[0]
-                                      for fmt in ["%a, %b %d, %Y", "%b %d, %Y"]:
-                                          try:
-                                              date_val = datetime.strptime(date_part, fmt).date()
-                                              break
-                                          except ValueError:
-                                              continue
-                                  except Exception:
-                                     pass
-                             return (urgency_val, date_val)
-                        parsed_json.sort(key=sort_key)
-                        print("✅ Sorted events by urgency and date.")
-                        break # Stop searching after finding the first list
-
-                if not found_list:
-                    print("   Could not find a list within the dictionary response. Returning the dictionary as-is.")
-                    # parsed_json remains the dictionary
-                    pass # No sorting applied if not a list
-
-            else:
-                print("\n⚠️ WARNING: Parsed response is valid JSON, but not a list or dictionary.")
-                print(parsed_json) # Print unexpected structure
-                return jsonify({
-                    "status": "error",
-                    "message": "OpenAI returned valid JSON, but it was not a list or dictionary as expected.",
-                    "raw_response": formatted_events_str
-                }), 500
-
-        except json.JSONDecodeError as json_err:
-            print(f"\n❌❌❌ FAILED TO PARSE OPENAI RESPONSE AS JSON: {json_err}")
-            print("   The raw string received is printed above ('Raw String from OpenAI'). Check it carefully for errors or truncation.")
-            return jsonify({
-                "status": "error",
-                "message": f"Failed to parse OpenAI response as JSON: {json_err}",
-                "raw_response": formatted_events_str
-            }), 500
-        except Exception as parse_err:
-             print(f"\n❌ An error occurred processing the OpenAI JSON response: {parse_err}")
-             traceback.print_exc()
-             return jsonify({
-                 "status": "error",
-                 "message": f"An error occurred processing the OpenAI JSON response: {parse_err}",
-                 "raw_response": formatted_events_str # Include raw response for debugging
-             }), 500
-
-    else:
-        print("\n❌ Failed to get formatted events string from OpenAI function.")
-        return jsonify({
+    if not formatted_events:
+        if status.get("error"):
+            return {"status": "error", "message": status["error"], "step": "openai_call"}, 500
+        print("\n❌❌❌ FAILED TO PARSE ANY EVENTS FROM THE OPENAI RESPONSE.")
+        return {
             "status": "error",
-            "message": "OpenAI formatting function did not return a valid response string.",
-            "step": "openai_call_result"
-        }), 500
+            "message": "Failed to parse any events from the OpenAI response.",
+            "raw_response": status.get("raw_response") # Include raw response for debugging
+        }, 500
+    if status.get("truncated"):
+        print(f"⚠️ OpenAI response was truncated; salvaged {len(formatted_events)} complete events.")
+
+    # --- Rank via the urgency index and cache the snapshot ---
+    snapshot = store_events_snapshot(formatted_events, {
+        "total_scraped": len(raw_events),
+        "filtered_for_formatting": len(filtered_events),
+        "sent_to_openai": len(events_for_batch),
+        "received_from_openai": status.get("received", len(formatted_events)),
+        "missing_from_openai": [event_identity(e) for e in status.get("missing", [])], # Links of events the model never returned
+    })
+    print("✅ Ranked events by urgency and date.")
 
     total_time = time.time() - total_start_time
     print(f"\n🏁 Request finished in {total_time:.2f} seconds.")
-
-    # Return the parsed and potentially re-sorted JSON
-    return jsonify({
+    return snapshot_payload(snapshot), 200
+
+
+# --- Snapshot cache ---
+# The last successful pipeline result, indexed by date. Requests within
+# EVENTS_CACHE_TTL_SECONDS are answered from it; urgency and ranking are kept correct
+# across midnight by the index instead of re-parsing dates on every request.
+events_snapshot = None
+events_snapshot_lock = threading.Lock()
+
+def store_events_snapshot(records, meta):
+    global events_snapshot
+    snapshot = {"index": UrgencyIndex(records), "meta": meta, "built_at": time.time()}
+    with events_snapshot_lock:
+        events_snapshot = snapshot
+    return snapshot
+
+def current_events_snapshot():
+    """The cached snapshot regardless of age (None before the first successful run)."""
+    with events_snapshot_lock:
+        return events_snapshot
+
+def fresh_events_snapshot():
+    """The cached snapshot if it is younger than EVENTS_CACHE_TTL_SECONDS, else None."""
+    with events_snapshot_lock:
+        snapshot = events_snapshot
+    if snapshot and time.time() - snapshot["built_at"] < EVENTS_CACHE_TTL_SECONDS:
+        return snapshot
+    return None
+
+def snapshot_payload(snapshot):
+    index = snapshot["index"]
+    return {
         "status": "success",
-        "message": f"Successfully scraped and formatted {len(parsed_json) if isinstance(parsed_json, list) else 'N/A'} events.",
+        "message": f"Successfully scraped and formatted {len(index)} events.",
+        **snapshot["meta"],
+        "generated_at": datetime.fromtimestamp(snapshot["built_at"]).isoformat(timespec="seconds"),
+        "urgency_counts": index.counts(),
+        "events": index.ranked_dicts(),
+    }
+
+
+# --- Rate limiting & request coalescing ---
+# A burst of app launches would otherwise trigger one full scrape + OpenAI call each.
+events_rate_limiter = RateLimiter(
+    per_client_rate=EVENTS_RATE_PER_CLIENT_PER_MIN / 60.0,
+    per_client_burst=EVENTS_BURST_PER_CLIENT,
+    global_rate=EVENTS_RATE_GLOBAL_PER_MIN / 60.0,
+    global_burst=EVENTS_BURST_GLOBAL,
+)
+events_flight = SingleFlight()
+events_stream_flight = StreamFlight()
+
+# Rendered .ics bodies per (snapshot, filters); see get_events_ics.
+ics_cache = IcsCache()
+
+def client_id_for_request():
+    """
+    Identifies the caller by peer address. Behind TRUSTED_PROXY_HOPS proxies it takes the
+    X-Forwarded-For entry the outermost trusted proxy added (Nth from the right); entries
+    to the left of that are client-supplied and not trusted.
+    """
+    if TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.remote_addr or "unknown"
+
+def rate_limited_response():
+    """Returns a 429 response (with Retry-After) if this request should be shed, else None."""
+    allowed, retry_after, scope = events_rate_limiter.check(client_id_for_request())
+    if allowed:
+        return None
+    print(f"🚦 Shedding {request.path} request ({scope} rate limit), retry after {retry_after:.1f}s")
+    response = jsonify({"status": "error", "message": f"Too many requests ({scope} limit). Please retry later.", "step": "rate_limit"})
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after_header(retry_after)
+    return response
+
+
+# --- Flask Routes ---
+
+@app.route('/')
+def index():
+    """Root endpoint."""
+    # Must stay cheap: this is the health check, so don't force the OpenAI import here.
+    if openai_init_error:
+        status = "Degraded (OpenAI client failed to initialize)"
+    elif client is None and not os.getenv("OPENAI_API_KEY"):
+        status = "Degraded (OPENAI_API_KEY is not set)"
+    else:
+        status = "Operational"
+    message = "Purdue Events Scraper and Formatter Service"
+    if openai_init_error:
+        message += f"\nWARNING: {openai_init_error}"
+    return jsonify({"status": status, "message": message})
+
+@app.route('/events', methods=['GET'])
+@profiled
+def get_events():
+    """
+    Endpoint to trigger the event scraping and formatting process.
+    Returns a JSON array of formatted events.
+    """
+    print("\n--- Received request to /events ---")
+    limited = rate_limited_response()
+    if limited:
+        return limited
+
+    snapshot = fresh_events_snapshot()
+    if snapshot:
+        print(f"🎯 Serving cached snapshot ({time.time() - snapshot['built_at']:.0f}s old).")
+        return jsonify(snapshot_payload(snapshot))
+
+    # Identical concurrent requests share one in-flight pipeline run.
+    (payload, http_status), shared = events_flight.do("events", run_events_pipeline)
+    if shared:
+        print("🔗 Served from a concurrent in-flight pipeline run.")
+    return jsonify(payload), http_status
+
+@app.route('/events.ics', methods=['GET'])
+def get_events_ics():
+    """
+    iCalendar feed of the cached snapshot, optionally filtered with ?category=Music,Arts
+    and ?audience=. Never scrapes or calls OpenAI: calendar apps poll this often, so it is
+    served from the last snapshot (whatever its age) with ETag/304 support.
+    """
+    snapshot = current_events_snapshot()
+    if snapshot is None:
+        response = jsonify({"status": "error", "message": "No events snapshot yet. Try again shortly.", "step": "snapshot"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "60"
+        return response
+
+    categories = tuple(sorted(c.strip().lower() for c in request.args.get("category", "").split(",") if c.strip()))
+    audience = request.args.get("audience", "").strip().lower()
+    calendar_name = "Purdue Events" + (f" – {', '.join(c.title() for c in categories)}" if categories else "")
+
+    key = (snapshot["built_at"], categories, audience)
+    body = ics_cache.get(key)
+    if body is None: # Stream it while rendering; the finished body is cached for the next poll
+        body = ics_cache.stream(key, iter_ics(filter_records(snapshot["index"].records, categories, audience),
+                                              calendar_name, snapshot["built_at"]))
+    response = Response(body, mimetype="text/calendar")
+    response.headers["Content-Disposition"] = 'inline; filename="events.ics"'
+    response.headers["Cache-Control"] = "public, max-age=900"
+    response.set_etag(ics_cache.etag_for(key))
+    return response.make_conditional(request)
+
+def generate_event_stream_lines():
+    """
+    NDJSON lines for /events/stream: one {"type": "event"} line per formatted event as soon
+    as the model finishes it, then a {"type": "summary"} line. Stores the result as the
+    snapshot, like run_events_pipeline.
+    """
+    total_start_time = time.time()
+    raw_events, filtered_events, scrape_error = scrape_and_filter_events()
+    if scrape_error:
+        yield json.dumps({"type": "error", "message": scrape_error, "step": "scraping"}) + "\n"
+        return
+
+    events_for_batch = select_batch(filtered_events) if filtered_events else []
+    status = {}
+    formatted_events = []
+    for event in iter_postprocessed_events(events_for_batch, status):
+        formatted_events.append(event)
+        yield json.dumps({"type": "event", "event": event.to_dict()}) + "\n"
+
+    if status.get("error") and not formatted_events:
+        yield json.dumps({"type": "error", "message": status["error"], "step": "openai_call"}) + "\n"
+        return
+    meta = {
         "total_scraped": len(raw_events),
         "filtered_for_formatting": len(filtered_events),
-        "sent_to_openai": num_events_sent_to_openai,
-        "received_from_openai": num_events_received_from_openai if isinstance(parsed_json, list) else "N/A",
-        "events": parsed_json # This will be the list or potentially the dictionary if list wasn't found
+        "sent_to_openai": len(events_for_batch),
+        "received_from_openai": len(formatted_events),
+        "missing_from_openai": [event_identity(e) for e in status.get("missing", [])],
+    }
+    if formatted_events:
+        store_events_snapshot(formatted_events, meta)
+    print(f"\n🏁 Streamed {len(formatted_events)} events in {time.time() - total_start_time:.2f} seconds.")
+    yield json.dumps({"type": "summary", **meta,
+                      "truncated": status.get("truncated", False), "hedged": status.get("hedged", False)}) + "\n"
+
+@app.route('/events/stream', methods=['GET'])
+def stream_events():
+    """
+    Streaming variant of /events. Responds with NDJSON: one {"type": "event"} line per
+    formatted event as soon as the model finishes it, then a final {"type": "summary"} line.
+    Events arrive in completion order; clients sort by 'calculated_urgency_check'/'parsed_date'.
+    A fresh snapshot is streamed as is (ranked, summary has "cached": true), and concurrent
+    requests share one in-flight run, which becomes the new snapshot.
+    """
+    print("\n--- Received request to /events/stream ---")
+    limited = rate_limited_response()
+    if limited:
+        return limited
+
+    snapshot = fresh_events_snapshot()
+    if snapshot:
+        print(f"🎯 Streaming cached snapshot ({time.time() - snapshot['built_at']:.0f}s old).")
+        def generate():
+            for event in snapshot["index"].ranked_dicts():
+                yield json.dumps({"type": "event", "event": event}) + "\n"
+            yield json.dumps({"type": "summary", **snapshot["meta"], "cached": True,
+                              "generated_at": datetime.fromtimestamp(snapshot["built_at"]).isoformat(timespec="seconds")}) + "\n"
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    # Concurrent streamers follow one in-flight run instead of each scraping and calling OpenAI.
+    lines, shared = events_stream_flight.stream("events", generate_event_stream_lines)
+    if shared:
+        print("🔗 Following a concurrent in-flight streaming run.")
+    return Response(lines, mimetype="application/x-ndjson")
+
+@app.route('/sources', methods=['GET'])
+def get_sources():
+    """Health of every configured event source (state, last success/error, backoff)."""
+    health = source_scheduler.health()
+    ok = sum(1 for source in health if source["state"] in ("ok", "pending"))
+    return jsonify({"status": "ok" if ok == len(health) else "degraded", "sources": health})
+
+@app.route('/debug/openai', methods=['GET'])
+def get_openai_stats():
+    """Admin-only hedging/deadline report: hedge rate and time-to-first-result percentiles."""
+    if not is_admin_request():
+        abort(404)
+    return jsonify({
+        "deadline_seconds": OPENAI_DEADLINE_SECONDS,
+        "hedging": OPENAI_HEDGING,
+        "hedge_after_seconds": round(openai_latency.percentile(OPENAI_HEDGE_PERCENTILE), 3),
+        "fallback_model": OPENAI_FALLBACK_MODEL,
+        **hedge_stats.snapshot(),
     })
 
 
+# Admin-only listing/download of profiles captured by @profiled (see profiling.py)
+register_profile_routes(app)
+# Resized, cached event thumbnails (see image_proxy.py)
+register_image_routes(app)
+
+
+# Gunicorn & co. bind their socket before importing the app, so warming up from here
+# already happens after the port is open; the delay covers `python event_scrapper_flask.py`.
+if WARM_UP:
+    start_background_warm_up()
+
+
 # --- Main execution block for Flask ---
 if __name__ == "__main__":
     # Ensure required libraries are installed:
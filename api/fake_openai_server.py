@@ -0,0 +1,174 @@
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# --- Local stand-in for the OpenAI chat completions API ---
+# Answers POST /v1/chat/completions with deterministic "formatted" events built from
+# the input events embedded in the prompt, either as a normal JSON response or as
+# SSE chunks when the request sets stream=True. Point the service at it with:
+#
+#   python fake_openai_server.py --port 8765 --chunk-size 20 --delay 0.01
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python event_scrapper_flask.py
+#
+# --latency-scale adds a heavy-tailed (Pareto) wait before the first byte of each
+# response, like a real API's occasional very slow call; useful for exercising hedging.
+
+CONFIG = {
+    "chunk_size": 20,       # Characters of content per streamed chunk
+    "delay": 0.01,          # Seconds to sleep between chunks (and once before a non-streamed reply)
+    "truncate_after": None, # Stop after this many characters with finish_reason='length'
+    "latency_scale": 0.0,   # Minimum first-byte wait in seconds; 0 disables the heavy tail
+    "latency_alpha": 1.5,   # Pareto shape: smaller means a heavier tail
+    "latency_cap": 60.0,    # Never wait longer than this
+    "fast_model": None,     # Model name answered with 1/4 of the wait (a cheaper fallback model)
+}
+
+
+def first_byte_delay(model):
+    """Heavy-tailed wait before a response starts, per CONFIG."""
+    if not CONFIG["latency_scale"]:
+        return 0.0
+    delay = min(CONFIG["latency_cap"], CONFIG["latency_scale"] * random.paretovariate(CONFIG["latency_alpha"]))
+    return delay / 4 if model == CONFIG["fast_model"] else delay
+
+
+def extract_input_events(messages):
+    """Finds the 'Input JSON (N events):' array in the user prompt."""
+    for message in messages:
+        content = message.get("content") or ""
+        match = re.search(r"Input JSON \(\d+ events\):\s*\n", content)
+        if match:
+            return json.loads(content[match.end():])
+    return []
+
+
+def fake_format(events):
+    """Produces output shaped like the model's: a JSON array of formatted events."""
+    formatted = []
+    for rank, event in enumerate(events, start=1):
+        raw_date = (event.get("date") or "").split(";")[0].strip()
+        description = event.get("description") or ""
+        title_words = re.findall(r"[a-z]+", (event.get("title") or "").lower())
+        formatted.append({
+            "title": event.get("title"),
+            "location": event.get("location"),
+            "link": event.get("link"),
+            "image": event.get("image"),
+            "description": description,
+            "parsed_date": raw_date or None,
+            "time": None,
+            "short_description": description.split(".")[0][:200] or None,
+            "category": "General",
+            "ranking": rank,
+            "tags": title_words[:3] or ["event"],
+        })
+    return json.dumps(formatted, indent=2)
+
+
+def completion_body(model, content, finish_reason):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason,
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4},
+    }
+
+
+def chunk_body(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        print(f"🤖 fake-openai: {fmt % args}")
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = json.loads(self.rfile.read(length) or b"{}")
+        model = request_body.get("model", "fake-model")
+        content = fake_format(extract_input_events(request_body.get("messages", [])))
+
+        finish_reason = "stop"
+        if CONFIG["truncate_after"] is not None and len(content) > CONFIG["truncate_after"]:
+            content = content[:CONFIG["truncate_after"]]
+            finish_reason = "length"
+
+        time.sleep(first_byte_delay(model))
+        if request_body.get("stream"):
+            self._send_stream(model, content, finish_reason)
+        else:
+            time.sleep(CONFIG["delay"])
+            payload = json.dumps(completion_body(model, content, finish_reason)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def _send_stream(self, model, content, finish_reason):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send_event(data):
+            self.wfile.write(f"data: {data}\n\n".encode())
+            self.wfile.flush()
+
+        send_event(json.dumps(chunk_body(model, {"role": "assistant", "content": ""})))
+        size = CONFIG["chunk_size"]
+        for start in range(0, len(content), size):
+            time.sleep(CONFIG["delay"])
+            send_event(json.dumps(chunk_body(model, {"content": content[start:start + size]})))
+        send_event(json.dumps(chunk_body(model, {}, finish_reason)))
+        send_event("[DONE]")
+        self.close_connection = True
+
+
+def serve(port=8765, host="127.0.0.1"):
+    """Starts the fake server (blocking). Returns only on KeyboardInterrupt."""
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    print(f"🤖 Fake OpenAI server listening on http://{host}:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Local fake OpenAI chat completions server (supports SSE streaming).")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--chunk-size", type=int, default=CONFIG["chunk_size"])
+    arg_parser.add_argument("--delay", type=float, default=CONFIG["delay"])
+    arg_parser.add_argument("--truncate-after", type=int, default=None)
+    arg_parser.add_argument("--latency-scale", type=float, default=CONFIG["latency_scale"], help="Minimum Pareto first-byte wait in seconds (0 = off).")
+    arg_parser.add_argument("--latency-alpha", type=float, default=CONFIG["latency_alpha"], help="Pareto shape; smaller is heavier-tailed.")
+    arg_parser.add_argument("--fast-model", default=None, help="Model name that answers 4x faster.")
+    args = arg_parser.parse_args()
+    CONFIG.update(chunk_size=args.chunk_size, delay=args.delay, truncate_after=args.truncate_after,
+                  latency_scale=args.latency_scale, latency_alpha=args.latency_alpha, fast_model=args.fast_model)
+    serve(port=args.port)
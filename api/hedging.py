@@ -0,0 +1,198 @@
+import bisect
+import queue
+import threading
+import time
+from collections import deque
+
+from thread_profiler import profile_in_thread
+
+
+# --- Hedged, deadline-aware calls ---
+# A single slow completion sets the tail latency of the whole /events request. Here
+# each call gets a deadline, and if it hasn't produced its first result by the observed
+# p90 latency a duplicate "hedge" request is fired; whichever answers first wins and the
+# loser is told to stop. When the deadline is too close for another full call at the
+# primary model's p90 latency, the hedge goes to a faster fallback model instead.
+#
+# Attempts are generators (the streaming formatter yields events one by one), so the
+# race is decided on the first item and the winner's remaining items stream through.
+
+HEDGE_DEFAULT_AFTER_SECONDS = 8.0  # Used until enough latencies have been observed
+HEDGE_MIN_SAMPLES = 10
+LATENCY_WINDOW = 200
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies with percentile lookups."""
+
+    def __init__(self, window=LATENCY_WINDOW, default=HEDGE_DEFAULT_AFTER_SECONDS, min_samples=HEDGE_MIN_SAMPLES):
+        self.samples = deque(maxlen=window)
+        self.default = default
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p):
+        """p-th percentile (0-100) of recent latencies, or the default until warmed up."""
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return self.default
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class HedgeStats:
+    """Counters and end-to-end latencies for reporting hedge rate and tail latency."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallback_hedges = 0
+        self.deadline_exceeded = 0
+        self.latencies = []   # Kept sorted; time to first result per call
+
+    def add(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_latency(self, seconds):
+        with self.lock:
+            bisect.insort(self.latencies, seconds)
+            if len(self.latencies) > 10000:
+                del self.latencies[::2] # Keep the distribution, halve the memory
+
+    def _pct(self, p):
+        if not self.latencies:
+            return None
+        return round(self.latencies[min(len(self.latencies) - 1, int(len(self.latencies) * p / 100))], 3)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_rate": round(self.hedged / self.calls, 3) if self.calls else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "fallback_hedges": self.fallback_hedges,
+                "deadline_exceeded": self.deadline_exceeded,
+                "latency_p50": self._pct(50),
+                "latency_p90": self._pct(90),
+                "latency_p99": self._pct(99),
+            }
+
+
+def hedged_stream(start_attempt, status, tracker, stats, deadline_seconds,
+                  primary_model, fallback_model=None, hedge_percentile=90, hedging=True):
+    """
+    Generator racing up to two attempts of `start_attempt(model, attempt_status, timeout, stop)`,
+    which must return a generator. `stop` is a threading.Event set once the attempt has
+    lost (or the call is over); attempts should check it per chunk and close their stream. Yields the winning attempt's items. Copies the winner's
+    status into `status` and adds 'hedged', 'model' and, on timeout, 'deadline_exceeded'.
+    """
+    results = queue.Queue()
+    attempts = []  # [(stop_event, attempt_status, model)]
+    started = time.monotonic()
+    deadline_at = started + deadline_seconds
+    hedge_at = started + tracker.percentile(hedge_percentile) if hedging else None
+
+    def launch(model):
+        index = len(attempts)
+        stop = threading.Event()
+        attempt_status = {}
+        attempts.append((stop, attempt_status, model))
+
+        def worker():
+            gen = None
+            launched = time.monotonic()
+            # Every primary-model attempt's own time to first item feeds the tracker, win or
+            # lose: recording only winners would drop exactly the slow calls hedging cuts off
+            # and drag the hedge threshold down. Fallback-model latencies are left out.
+            track = model == primary_model
+            try:
+                gen = start_attempt(model, attempt_status, max(0.1, deadline_at - time.monotonic()), stop)
+                for item in gen:
+                    if track:
+                        tracker.record(time.monotonic() - launched)
+                        track = False
+                    if stop.is_set():
+                        break
+                    results.put((index, "item", item))
+            except Exception as e:
+                attempt_status.setdefault("error", f"Error calling OpenAI API: {e}")
+            finally:
+                if track and (stop.is_set() or time.monotonic() >= deadline_at):
+                    # Abandoned or timed out before its first item: it was at least this slow.
+                    tracker.record(time.monotonic() - launched)
+                if gen is not None:
+                    gen.close() # Lets the attempt close its HTTP stream
+                results.put((index, "done", None))
+
+        threading.Thread(target=profile_in_thread(worker), name=f"openai-attempt-{index}", daemon=True).start()
+
+    stats.add(calls=1)
+    launch(primary_model)
+    winner = None
+    finished = set()
+
+    try:
+        while True:
+            now = time.monotonic()
+            if winner is None and hedge_at is not None and len(attempts) == 1 and now >= hedge_at:
+                # Would a fresh primary call likely miss the deadline? Hedge on the faster model.
+                remaining = deadline_at - now
+                use_fallback = bool(fallback_model) and remaining < tracker.percentile(hedge_percentile)
+                model = fallback_model if use_fallback else primary_model
+                print(f"   🔀 No result after {now - started:.1f}s (p{hedge_percentile}); hedging with {model}.")
+                stats.add(hedged=1, fallback_hedges=1 if use_fallback else 0)
+                launch(model)
+
+            wake_at = deadline_at
+            if winner is None and hedge_at is not None and len(attempts) == 1:
+                wake_at = min(wake_at, hedge_at)
+            try:
+                index, kind, item = results.get(timeout=max(0.0, wake_at - now))
+            except queue.Empty:
+                if time.monotonic() >= deadline_at:
+                    print(f"   ⏰ OpenAI deadline of {deadline_seconds:.1f}s exceeded.")
+                    stats.add(deadline_exceeded=1)
+                    status["deadline_exceeded"] = True
+                    status.setdefault("error", None if winner is not None else f"OpenAI call exceeded its {deadline_seconds:.1f}s deadline.")
+                    break
+                continue
+
+            if kind == "item":
+                if winner is None:
+                    winner = index
+                    stats.record_latency(time.monotonic() - started)
+                    if index > 0:
+                        stats.add(hedge_wins=1)
+                    for other, (stop, _, _) in enumerate(attempts):
+                        if other != index:
+                            stop.set()
+                if index == winner:
+                    yield item
+                continue
+
+            finished.add(index)
+            if index == winner:
+                break
+            if winner is None and len(finished) == len(attempts):
+                # Every attempt ended without producing anything. A hedge can't help a
+                # failure that already happened, so report the most recent attempt's status.
+                break
+    finally:
+        for stop, _, _ in attempts:
+            stop.set()
+
+    chosen = winner if winner is not None else len(attempts) - 1
+    attempt_status = attempts[chosen][1]
+    for key, value in attempt_status.items():
+        status.setdefault(key, value)
+    status["hedged"] = len(attempts) > 1
+    status["model"] = attempts[chosen][2]
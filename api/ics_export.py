@@ -0,0 +1,218 @@
+import datetime
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from event_record import parse_display_range
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9: emit floating local times instead of UTC
+    ZoneInfo = None
+
+
+# --- iCalendar (.ics) export of formatted event snapshots ---
+# Builds RFC 5545 calendars from EventRecords. Timed events become UTC DTSTART/DTEND
+# (converted from EVENTS_TIMEZONE), events without a usable time become all-day
+# events, and 'additional_days' (or a parsed_date range such as "Oct 19 - Oct 21, 2026")
+# turns into a daily RRULE (timed) or a longer span (all-day).
+
+EVENTS_TIMEZONE = os.getenv("EVENTS_TIMEZONE", "America/Indiana/Indianapolis") # Purdue's local time
+DEFAULT_DURATION = datetime.timedelta(hours=1)
+ICS_CACHE_SIZE = 64 # Distinct (snapshot, filter) combinations kept in memory
+
+_TIME_RE = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?|noon)?", re.IGNORECASE)
+
+
+def _to_24h(hour, minute, meridiem):
+    meridiem = (meridiem or "").lower().replace(".", "")
+    if meridiem == "noon":
+        return 12, 0
+    if meridiem == "pm" and hour != 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    return hour, minute
+
+
+def parse_time_range(time_text):
+    """
+    Parses strings like "3pm to 4pm", "10:00 AM - 11:30 AM" or "3-4 p.m.".
+    Returns (start_time, end_time_or_None), or None if no usable time is found.
+    """
+    if not time_text:
+        return None
+    matches = [m for m in _TIME_RE.finditer(time_text) if m.group(1)]
+    if not matches:
+        return None
+    parts = [(int(m.group(1)), int(m.group(2) or 0), m.group(3)) for m in matches[:2]]
+    # "3 to 4pm": the start inherits the end's am/pm.
+    if len(parts) == 2 and not parts[0][2] and parts[1][2]:
+        parts[0] = (parts[0][0], parts[0][1], parts[1][2])
+    if not parts[0][2]:
+        return None # A bare number is more likely a date or room than a time
+    try:
+        times = [datetime.time(*_to_24h(*part)) for part in parts]
+    except ValueError:
+        return None
+    return times[0], (times[1] if len(times) > 1 else None)
+
+
+def _escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """Folds a content line to 75 octets, as RFC 5545 requires."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    pieces = []
+    while encoded:
+        limit = 75 if not pieces else 74 # Continuation lines start with a space
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80: # Don't split a UTF-8 sequence
+            cut -= 1
+        pieces.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(pieces)
+
+
+def _utc_stamp(local_dt, tz):
+    if tz is None:
+        return local_dt.strftime("%Y%m%dT%H%M%S") # Floating time
+    return local_dt.replace(tzinfo=tz).astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def vevent_lines(record, dtstamp, tz):
+    """Content lines for one event, or [] if it has no usable date."""
+    if not record.start_date:
+        return []
+    uid = hashlib.sha1((record.link or record.title or "").encode("utf-8")).hexdigest()
+    extra_days = record.additional_days if isinstance(record.additional_days, int) and record.additional_days > 0 else 0
+    if not extra_days: # The model may leave it out; a parsed_date range still says how long the event runs
+        span = parse_display_range(record.parsed_date)
+        extra_days = max(0, (span[1] - span[0]).days) if span else 0
+
+    lines = ["BEGIN:VEVENT", f"UID:{uid}@mycompass", f"DTSTAMP:{dtstamp}"]
+    times = parse_time_range(record.time)
+    if times:
+        start = datetime.datetime.combine(record.start_date, times[0])
+        end = datetime.datetime.combine(record.start_date, times[1]) if times[1] else start + DEFAULT_DURATION
+        if end <= start:
+            end = start + DEFAULT_DURATION
+        lines.append(f"DTSTART:{_utc_stamp(start, tz)}")
+        lines.append(f"DTEND:{_utc_stamp(end, tz)}")
+        if extra_days:
+            lines.append(f"RRULE:FREQ=DAILY;COUNT={extra_days + 1}")
+    else:
+        end_date = record.start_date + datetime.timedelta(days=extra_days + 1)
+        lines.append(f"DTSTART;VALUE=DATE:{record.start_date.strftime('%Y%m%d')}")
+        lines.append(f"DTEND;VALUE=DATE:{end_date.strftime('%Y%m%d')}")
+
+    lines.append(f"SUMMARY:{_escape(record.title or 'Event')}")
+    if record.location:
+        lines.append(f"LOCATION:{_escape(record.location)}")
+    description = record.short_description or record.description
+    if description:
+        if record.link:
+            description = f"{description}\n\n{record.link}"
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    if record.link:
+        lines.append(f"URL:{record.link}")
+    if record.category:
+        lines.append(f"CATEGORIES:{_escape(record.category)}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def _encode_lines(lines):
+    return "".join(_fold(line) + "\r\n" for line in lines).encode("utf-8")
+
+
+def iter_ics(records, calendar_name, generated_at):
+    """Yields the calendar as UTF-8 chunks: the header, one chunk per event, then the footer."""
+    tz = None
+    if ZoneInfo is not None:
+        try:
+            tz = ZoneInfo(EVENTS_TIMEZONE)
+        except Exception:
+            print(f"⚠️ Unknown timezone {EVENTS_TIMEZONE!r}; writing floating local times.")
+    dtstamp = datetime.datetime.fromtimestamp(generated_at, datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    yield _encode_lines([
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//MyCompass//Purdue Events//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(calendar_name)}",
+        "REFRESH-INTERVAL;VALUE=DURATION:PT1H",
+        "X-PUBLISHED-TTL:PT1H",
+    ])
+    for record in records:
+        lines = vevent_lines(record, dtstamp, tz)
+        if lines:
+            yield _encode_lines(lines)
+    yield _encode_lines(["END:VCALENDAR"])
+
+
+def build_ics(records, calendar_name, generated_at):
+    """Returns the calendar as UTF-8 bytes."""
+    return b"".join(iter_ics(records, calendar_name, generated_at))
+
+
+def filter_records(records, categories=None, audience=None):
+    """
+    Keeps records whose category is one of `categories` (case-insensitive) and, if
+    `audience` is given, whose 'audience' (as assigned by the model) or tags match it.
+    """
+    wanted = {c.strip().lower() for c in categories or () if c.strip()}
+    audience = (audience or "").strip().lower()
+    selected = []
+    for record in records:
+        if wanted and (record.category or "").lower() not in wanted:
+            continue
+        if audience:
+            if audience != (record.audience or "").lower() and audience not in record.tags:
+                continue
+        selected.append(record)
+    return selected
+
+
+class IcsCache:
+    """
+    Caches rendered calendars per (snapshot, filters) so polling never re-renders them.
+    A snapshot never changes once built, so the key alone determines the body and its ETag.
+    """
+
+    def __init__(self, size=ICS_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def etag_for(key):
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached body bytes, or None."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        return None
+
+    def stream(self, key, chunks):
+        """Passes `chunks` through and caches the full body once the last one has been sent."""
+        sent = []
+        for chunk in chunks:
+            sent.append(chunk)
+            yield chunk
+        with self.lock:
+            self.entries[key] = b"".join(sent)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
@@ -0,0 +1,231 @@
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+from urllib.parse import urlparse
+
+from flask import abort, request, send_file
+
+
+# --- Event image proxy with resized, cached thumbnails ---
+# Event images on events.purdue.edu are full-size originals. The service registers each
+# image URL it returns, and /images/<id>?w=320 serves a resized WebP/JPEG from an
+# on-disk cache (LRU by access time, capped at IMAGE_CACHE_MAX_BYTES). Originals are
+# fetched from the upstream at most once per cache lifetime.
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+IMAGE_PROXY_ALLOWED_HOSTS = set(os.getenv("IMAGE_PROXY_ALLOWED_HOSTS", "events.purdue.edu").split(","))
+THUMBNAIL_WIDTHS = (160, 320, 640)
+DEFAULT_THUMBNAIL_WIDTH = 320
+MAX_ORIGINAL_BYTES = 15 * 1024 * 1024
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+CACHE_MAX_AGE = 365 * 24 * 3600 # Thumbnails never change for a given id
+
+_pil_image = False # Not yet imported; None once we know Pillow is missing
+
+def _pil():
+    """Imports Pillow on first use. Returns the PIL.Image module, or None if not installed."""
+    global _pil_image
+    if _pil_image is False:
+        try:
+            from PIL import Image  # pip install Pillow
+            _pil_image = Image
+        except ImportError:  # Without Pillow the proxy still caches, but serves originals unresized
+            _pil_image = None
+    return _pil_image
+
+# Striped per-image locks: a fixed set shared by hash, so memory doesn't grow with the
+# number of images ever requested. Two images rarely share a stripe, and if they do one
+# render just waits for the other.
+ID_LOCK_STRIPES = 64
+_id_locks = [threading.Lock() for _ in range(ID_LOCK_STRIPES)]
+_evict_lock = threading.Lock()
+
+
+def image_id(url):
+    """Stable id for an image URL."""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+
+
+def _path(name):
+    return os.path.join(IMAGE_CACHE_DIR, name)
+
+
+def _lock_for(img_id):
+    return _id_locks[hash(img_id) % ID_LOCK_STRIPES]
+
+
+def allow_image_host(url_or_host):
+    """Adds a site (URL or bare hostname) to IMAGE_PROXY_ALLOWED_HOSTS."""
+    host = urlparse(url_or_host).hostname if "//" in url_or_host else url_or_host
+    if host:
+        IMAGE_PROXY_ALLOWED_HOSTS.add(host)
+
+
+def register_image(url):
+    """
+    Records that `url` may be proxied and returns its proxy path ('/images/<id>'),
+    or None if the URL is missing or not on an allowed host.
+    """
+    if not url or urlparse(url).hostname not in IMAGE_PROXY_ALLOWED_HOSTS:
+        return None
+    img_id = image_id(url)
+    url_file = _path(f"{img_id}.url")
+    if not os.path.exists(url_file):
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        with open(url_file, "w", encoding="utf-8") as f:
+            f.write(url)
+    return f"/images/{img_id}"
+
+
+def _registered_url(img_id):
+    try:
+        with open(_path(f"{img_id}.url"), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _fetch_original(img_id):
+    """Downloads the original once. Returns its bytes, or None on failure."""
+    original_path = _path(f"{img_id}.orig")
+    if os.path.exists(original_path):
+        with open(original_path, "rb") as f:
+            return f.read()
+
+    url = _registered_url(img_id)
+    if not url:
+        return None
+    import requests
+    print(f"🖼️ Fetching original image {url}")
+    try:
+        response = requests.get(url, timeout=15, stream=True, headers={"User-Agent": "MyCompass-image-proxy/1.0"})
+        response.raise_for_status()
+        data = response.raw.read(MAX_ORIGINAL_BYTES + 1, decode_content=True)
+        response.close()
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Error fetching image {url}: {e}")
+        return None
+    if len(data) > MAX_ORIGINAL_BYTES:
+        print(f"⚠️ Image {url} is larger than {MAX_ORIGINAL_BYTES} bytes; not proxying.")
+        return None
+
+    tmp_path = f"{original_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, original_path)
+    return data
+
+
+def _render_thumbnail(original, width, fmt):
+    """Resizes to `width` (never upscaling) and encodes as WebP or JPEG."""
+    Image = _pil()
+    with Image.open(io.BytesIO(original)) as img:
+        img = img.convert("RGB") if img.mode not in ("RGB", "L") else img
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "webp":
+            img.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            img.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+def get_thumbnail(img_id, width, fmt):
+    """
+    Returns (path, mimetype) of a cached thumbnail, creating it (and the other widths,
+    which share the same decoded original) on first request. Returns (None, None) if
+    the image is unknown or can't be fetched.
+    """
+    if _pil() is None:
+        fmt = "orig"
+    thumb_path = _path(f"{img_id}-{width}.{fmt}") if fmt != "orig" else _path(f"{img_id}.orig")
+
+    if not os.path.exists(thumb_path):
+        with _lock_for(img_id):
+            if not os.path.exists(thumb_path):
+                original = _fetch_original(img_id)
+                if original is None:
+                    return None, None
+                if fmt != "orig":
+                    try:
+                        for w in THUMBNAIL_WIDTHS:
+                            data = _render_thumbnail(original, w, fmt)
+                            tmp_path = _path(f"{img_id}-{w}.{fmt}.tmp")
+                            with open(tmp_path, "wb") as f:
+                                f.write(data)
+                            os.replace(tmp_path, _path(f"{img_id}-{w}.{fmt}"))
+                    except Exception as e:
+                        print(f"❌ Could not resize image {img_id}: {e}")
+                        return None, None
+                _evict_if_needed()
+
+    try:
+        os.utime(thumb_path) # Mark as recently used for LRU eviction
+    except OSError:
+        return None, None
+    if fmt == "orig":
+        mimetype = mimetypes.guess_type(urlparse(_registered_url(img_id) or "").path)[0] or "image/jpeg"
+    else:
+        mimetype = {"webp": "image/webp", "jpeg": "image/jpeg"}[fmt]
+    return thumb_path, mimetype
+
+
+def _evict_if_needed():
+    """Deletes least-recently-used cache files until the cache fits in IMAGE_CACHE_MAX_BYTES."""
+    with _evict_lock:
+        entries = []
+        total = 0
+        for name in os.listdir(IMAGE_CACHE_DIR):
+            if name.endswith((".url", ".tmp")):
+                continue # URL registrations are tiny and needed to re-fetch evicted images
+            path = _path(name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= IMAGE_CACHE_MAX_BYTES:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= IMAGE_CACHE_MAX_BYTES * 0.9: # Leave some headroom so we don't evict on every request
+                break
+        print(f"🧹 Image cache trimmed to {total / 1024 / 1024:.1f} MB")
+
+
+def register_image_routes(app):
+    """Adds /images/<id> to the app."""
+
+    @app.route('/images/<img_id>', methods=['GET'])
+    def get_image(img_id):
+        if not img_id.isalnum() or len(img_id) != 20:
+            abort(404)
+        try:
+            requested_width = int(request.args.get("w", DEFAULT_THUMBNAIL_WIDTH))
+        except ValueError:
+            requested_width = DEFAULT_THUMBNAIL_WIDTH
+        # Snap to the nearest pre-rendered width so the cache stays bounded.
+        width = min(THUMBNAIL_WIDTHS, key=lambda w: abs(w - requested_width))
+        fmt = request.args.get("format")
+        if fmt not in ("webp", "jpeg"):
+            fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg"
+
+        path, mimetype = get_thumbnail(img_id, width, fmt)
+        if path is None:
+            abort(404)
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=CACHE_MAX_AGE)
+        response.headers["Cache-Control"] = f"public, max-age={CACHE_MAX_AGE}, immutable"
+        response.headers["Vary"] = "Accept"
+        return response
@@ -0,0 +1,240 @@
+import json
+from urllib.parse import urlsplit, urlunsplit
+
+
+# --- Incremental JSON array parsing for model output ---
+# The model is asked for a bare JSON array of event objects, but in practice it
+# may wrap it in ```json fences, in a {"events": [...]} dict, or get cut off by
+# max_tokens. This parser consumes text chunk by chunk (e.g. straight from a
+# streamed completion) and hands back each event object as soon as its closing
+# brace arrives, so a truncated response still yields every complete event.
+
+_SEEK, _ARRAY, _OBJECT, _DONE = "seek", "array", "object", "done"
+RAW_TAIL_CHARS = 4096 # Text kept for debugging once the whole response is no longer needed
+
+
+class IncrementalJSONArrayParser:
+    """
+    Pulls complete JSON objects out of the first JSON array found in a text stream.
+
+    Usage:
+        parser = IncrementalJSONArrayParser()
+        for chunk in chunks:
+            for event in parser.feed(chunk):
+                ...
+        leftovers = parser.close()
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0              # Next unscanned index into self._buf
+        self._state = _SEEK
+        self._obj_start = None     # Start index of the object being collected
+        self._depth = 0            # Nesting depth inside the current object
+        self._in_string = False
+        self._escape = False
+        self._objects_in_array = 0
+        self._raw = []             # Full text until the first object arrives (for close()'s fallback)
+        self._raw_tail = ""        # After that, only the last RAW_TAIL_CHARS characters
+        self.count = 0             # Number of objects emitted so far
+        self.errors = []           # Object slices that were complete but not valid JSON
+        self.used_fallback = False # True if close() had to parse the whole text instead
+
+    @property
+    def complete(self):
+        """True once the closing ']' of the events array has been seen."""
+        return self._state == _DONE
+
+    @property
+    def raw_text(self):
+        """
+        Everything fed so far while no object has been parsed (what unparseable responses
+        are debugged with); once objects stream, just the last RAW_TAIL_CHARS characters.
+        """
+        return "".join(self._raw) if self._raw else self._raw_tail
+
+    def feed(self, chunk):
+        """Adds a chunk of text and returns the list of objects completed by it."""
+        if not chunk or self._state == _DONE:
+            return []
+        if self.count:
+            self._raw_tail = (self._raw_tail + chunk)[-RAW_TAIL_CHARS:]
+        else:
+            self._raw.append(chunk)
+        self._buf += chunk
+        objects = self._scan()
+        if self.count and self._raw:
+            # close() only falls back to the whole text when nothing was parsed, so stop keeping it.
+            self._raw_tail = "".join(self._raw)[-RAW_TAIL_CHARS:]
+            self._raw = []
+        return objects
+
+    def close(self):
+        """
+        Signals end of input. Returns any objects only recoverable from the whole text,
+        i.e. when the model answered with a single object or a dict we could not stream.
+        """
+        if self.count or self._state == _DONE:
+            return []
+        text = strip_markdown_fences(self.raw_text)
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            return []
+        if isinstance(parsed, dict):
+            nested = next((v for v in parsed.values()
+                           if isinstance(v, list) and any(isinstance(item, dict) for item in v)), None)
+            parsed = nested if nested is not None else [parsed]
+        if not isinstance(parsed, list):
+            return []
+        objects = [item for item in parsed if isinstance(item, dict)]
+        self.count += len(objects)
+        self.used_fallback = True
+        return objects
+
+    def _scan(self):
+        objects = []
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+
+        while i < n:
+            ch = buf[i]
+
+            # String handling is shared by every state: brackets inside strings never count.
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                i += 1
+                continue
+            if ch == '"':
+                self._in_string = True
+                i += 1
+                continue
+
+            if self._state == _SEEK:
+                if ch == "[":
+                    self._state = _ARRAY
+                    self._objects_in_array = 0
+            elif self._state == _ARRAY:
+                if ch == "{":
+                    self._state = _OBJECT
+                    self._obj_start = i
+                    self._depth = 1
+                elif ch == "]":
+                    # An empty (or non-object) array is probably nested metadata inside a
+                    # wrapper dict, e.g. {"tags": [], "events": [...]}; keep looking.
+                    self._state = _DONE if self._objects_in_array else _SEEK
+                    if self._state == _DONE:
+                        i += 1
+                        break
+            elif self._state == _OBJECT:
+                if ch in "{[":
+                    self._depth += 1
+                elif ch in "}]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        obj_text = buf[self._obj_start:i + 1]
+                        try:
+                            obj = json.loads(obj_text)
+                        except json.JSONDecodeError as e:
+                            self.errors.append((obj_text, str(e)))
+                        else:
+                            objects.append(obj)
+                            self.count += 1
+                        self._objects_in_array += 1
+                        self._state = _ARRAY
+                        self._obj_start = None
+            i += 1
+
+        # Drop text we no longer need so long streams don't grow the buffer unbounded.
+        keep_from = self._obj_start if self._state == _OBJECT else i
+        self._buf = buf[keep_from:]
+        self._pos = i - keep_from
+        if self._state == _OBJECT:
+            self._obj_start = 0
+        return objects
+
+
+def strip_markdown_fences(text):
+    """Removes a leading ```/```json fence and its closing fence, if present."""
+    text = text.strip()
+    if text.startswith("```"):
+        first_newline = text.find("\n")
+        text = text[first_newline + 1:] if first_newline != -1 else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def parse_events_array(text):
+    """
+    One-shot helper: parses a full model response.
+    Returns (events_list, truncated) where truncated is True if the array never closed.
+    """
+    parser = IncrementalJSONArrayParser()
+    events = parser.feed(text or "")
+    events += parser.close()
+    return events, not (parser.complete or parser.used_fallback)
+
+
+def event_identity(event):
+    """Key used to match a formatted event back to the raw event it came from (dict or EventRecord)."""
+    if isinstance(event, dict):
+        return event.get("link") or event.get("title")
+    return event.identity
+
+
+def _field(event, name):
+    return event.get(name) if isinstance(event, dict) else getattr(event, name, None)
+
+
+def normalize_link(link):
+    """Link as a match key: case-insensitive scheme/host, no fragment, no trailing slash."""
+    if not link:
+        return None
+    parts = urlsplit(link.strip())
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def normalize_title(title):
+    return " ".join(title.split()).lower() if title else None
+
+
+class SentEventMatcher:
+    """
+    Maps events in the model's output back to the events that were sent, by normalized
+    link and then by title, so small rewrites (a trailing slash, http vs https casing,
+    re-spaced titles) don't count as a missing event.
+    """
+
+    def __init__(self, sent_events):
+        self.sent_events = list(sent_events)
+        self.by_link = {}
+        self.by_title = {}
+        for event in self.sent_events:
+            link, title = normalize_link(_field(event, "link")), normalize_title(_field(event, "title"))
+            if link:
+                self.by_link.setdefault(link, event)
+            if title:
+                self.by_title.setdefault(title, event)
+
+    def match(self, received_event):
+        """Returns the sent event this output event came from, or None."""
+        link = normalize_link(_field(received_event, "link"))
+        if link and link in self.by_link:
+            return self.by_link[link]
+        title = normalize_title(_field(received_event, "title"))
+        return self.by_title.get(title) if title else None
+
+
+def find_missing_events(sent_events, received_events):
+    """Returns the sent events that have no counterpart in the model's output, in order."""
+    matcher = SentEventMatcher(sent_events)
+    matched = {id(matcher.match(e)) for e in received_events}
+    return [e for e in matcher.sent_events if id(e) not in matched]
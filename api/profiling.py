@@ -0,0 +1,158 @@
+import cProfile
+import contextlib
+import functools
+import hmac
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+from flask import abort, jsonify, make_response, request, send_from_directory
+
+from thread_profiler import collecting_thread_profiles
+
+
+# --- On-demand request profiling ---
+# A request is profiled when either:
+#   - it carries X-Profile: cpu|mem|cpu,mem (or ?profile=...) AND a valid X-Admin-Token, or
+#   - it is picked by random sampling (PROFILE_SAMPLE_RATE, e.g. 0.01 for 1%).
+# CPU profiles are written as .prof (open with `python -m pstats` or snakeviz), allocation
+# profiles as tracemalloc snapshots (.tracemalloc, load with tracemalloc.Snapshot.load).
+# A CPU profile includes the worker threads the request fans out to (see thread_profiler.py).
+
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")  # Unset = on-demand profiling disabled
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_KINDS = os.getenv("PROFILE_SAMPLE_KINDS", "cpu")  # What sampled requests capture
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+
+PROFILE_EXTENSIONS = (".prof", ".tracemalloc")
+
+# cProfile and tracemalloc are both process-wide on modern Pythons; profile one request at a time.
+_profile_lock = threading.Lock()
+
+
+def is_admin_request():
+    """True if the request carries the configured admin token (header only, so it never lands in access logs)."""
+    if not PROFILING_ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(supplied.encode(), PROFILING_ADMIN_TOKEN.encode())
+
+
+def parse_profile_kinds(value):
+    kinds = {kind.strip().lower() for kind in (value or "").split(",") if kind.strip()}
+    if "all" in kinds or "1" in kinds or "true" in kinds:
+        return {"cpu", "mem"}
+    return kinds & {"cpu", "mem"}
+
+
+def requested_profile_kinds():
+    """Decides what (if anything) to capture for the current request."""
+    explicit = request.headers.get("X-Profile") or request.args.get("profile")
+    if explicit:
+        return parse_profile_kinds(explicit) if is_admin_request() else set()
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return parse_profile_kinds(PROFILE_SAMPLE_KINDS)
+    return set()
+
+
+def _prune_old_profiles():
+    """Keeps at most PROFILE_MAX_FILES profile files, deleting the oldest first."""
+    files = list_profiles()
+    for entry in files[PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, entry["name"]))
+        except OSError:
+            pass
+
+
+def profiled(fn):
+    """Route decorator: runs the view under cProfile and/or tracemalloc when requested."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        kinds = requested_profile_kinds()
+        if not kinds or not _profile_lock.acquire(blocking=False):
+            return fn(*args, **kwargs)
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{fn.__name__}-{uuid.uuid4().hex[:8]}"
+        profiler = cProfile.Profile() if "cpu" in kinds else None
+        started_tracemalloc = False
+        try:
+            if "mem" in kinds and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                started_tracemalloc = True
+            with (collecting_thread_profiles() if profiler else contextlib.nullcontext()) as thread_profiles:
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = make_response(fn(*args, **kwargs))
+                finally:
+                    if profiler:
+                        profiler.disable()
+
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            if profiler:
+                # Threads still running (e.g. an abandoned hedge attempt) are left out.
+                stats = pstats.Stats(profiler)
+                for thread_profiler in thread_profiles.drain():
+                    stats.add(thread_profiler)
+                stats.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+            if "mem" in kinds and tracemalloc.is_tracing():
+                tracemalloc.take_snapshot().dump(os.path.join(PROFILE_DIR, f"{profile_id}.tracemalloc"))
+            _prune_old_profiles()
+            print(f"🔬 Saved {'/'.join(sorted(kinds))} profile {profile_id}")
+            response.headers["X-Profile-Id"] = profile_id
+            return response
+        finally:
+            if started_tracemalloc:
+                tracemalloc.stop()
+            _profile_lock.release()
+    return wrapper
+
+
+def list_profiles():
+    """Returns saved profiles, newest first, as dicts with name/kind/size/created."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(PROFILE_EXTENSIONS):
+            continue
+        path = os.path.join(PROFILE_DIR, name)
+        stat = os.stat(path)
+        entries.append({
+            "name": name,
+            "kind": "cpu" if name.endswith(".prof") else "mem",
+            "size_bytes": stat.st_size,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(stat.st_mtime)),
+            "_mtime": stat.st_mtime,
+        })
+    entries.sort(key=lambda e: e["_mtime"], reverse=True)
+    for entry in entries:
+        del entry["_mtime"]
+    return entries
+
+
+def register_profile_routes(app):
+    """Adds the admin-only /debug/profiles listing and download routes to the app."""
+
+    @app.route('/debug/profiles', methods=['GET'])
+    def debug_list_profiles():
+        if not is_admin_request():
+            abort(404) # Don't advertise the debug surface to non-admins
+        return jsonify({
+            "status": "success",
+            "sample_rate": PROFILE_SAMPLE_RATE,
+            "profiles": list_profiles(),
+        })
+
+    @app.route('/debug/profiles/<name>', methods=['GET'])
+    def debug_get_profile(name):
+        if not is_admin_request() or not name.endswith(PROFILE_EXTENSIONS):
+            abort(404)
+        return send_from_directory(PROFILE_DIR, name, as_attachment=True)
@@ -0,0 +1,194 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+# --- Token-bucket rate limiting & request coalescing for the Flask routes ---
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes `tokens` if available.
+        Returns (allowed, retry_after_seconds); retry_after is 0 when allowed.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True, 0
+            if self.rate <= 0:
+                return False, math.inf
+            return False, (tokens - self.tokens) / self.rate
+
+    def refund(self, tokens=1):
+        """Gives back tokens taken by a request that was rejected further down the line."""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class RateLimiter:
+    """
+    Per-client buckets plus one global bucket. A request must pass both.
+    Per-client buckets are kept in an LRU capped at `max_clients` so a scan of
+    spoofed addresses can't grow memory without bound.
+    """
+
+    def __init__(self, per_client_rate, per_client_burst, global_rate, global_burst, max_clients=10000):
+        self.per_client_rate = per_client_rate
+        self.per_client_burst = per_client_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_clients = max_clients
+        self.clients = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _client_bucket(self, client_id):
+        with self.lock:
+            bucket = self.clients.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.per_client_rate, self.per_client_burst)
+                self.clients[client_id] = bucket
+                if len(self.clients) > self.max_clients:
+                    self.clients.popitem(last=False)
+            else:
+                self.clients.move_to_end(client_id)
+            return bucket
+
+    def check(self, client_id):
+        """Returns (allowed, retry_after_seconds, scope) where scope is 'client' or 'global'."""
+        client_bucket = self._client_bucket(client_id)
+        allowed, retry_after = client_bucket.try_acquire()
+        if not allowed:
+            return False, retry_after, "client"
+        allowed, retry_after = self.global_bucket.try_acquire()
+        if not allowed:
+            client_bucket.refund() # Don't charge the client for load they didn't cause
+            return False, retry_after, "global"
+        return True, 0, None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs `fn`, everyone
+    who arrives while it is in flight waits for and shares the same result (or exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Returns (result, shared) where shared is True if another caller did the work."""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._Call()
+                self.calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+def retry_after_header(seconds):
+    """Formats a Retry-After value (whole seconds, at least 1)."""
+    if seconds == math.inf:
+        return "3600"
+    return str(max(1, math.ceil(seconds)))
+
+
+class StreamFlight:
+    """
+    Streaming counterpart of SingleFlight: the first caller's generator runs on a background
+    thread, and every caller that arrives while it is in flight replays its items from the
+    start and then follows it live. A client disconnecting doesn't stop the run for the others.
+    """
+
+    class _Run:
+        def __init__(self):
+            self.cond = threading.Condition()
+            self.items = []
+            self.done = False
+            self.error = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = {}
+
+    def stream(self, key, make_iter):
+        """Returns (iterator over the run's items, shared) where shared is True if another caller started it."""
+        with self.lock:
+            run = self.runs.get(key)
+            shared = run is not None
+            if not shared:
+                run = self._Run()
+                self.runs[key] = run
+        if not shared:
+            threading.Thread(target=self._produce, args=(key, run, make_iter),
+                             name=f"stream-flight-{key}", daemon=True).start()
+        return self._follow(run), shared
+
+    def _produce(self, key, run, make_iter):
+        try:
+            for item in make_iter():
+                with run.cond:
+                    run.items.append(item)
+                    run.cond.notify_all()
+        except BaseException as e:
+            run.error = e
+        finally:
+            with self.lock:
+                del self.runs[key]
+            with run.cond:
+                run.done = True
+                run.cond.notify_all()
+
+    def _follow(self, run):
+        position = 0
+        while True:
+            with run.cond:
+                while position >= len(run.items) and not run.done:
+                    run.cond.wait()
+                batch = run.items[position:]
+                done = run.done
+            position += len(batch)
+            yield from batch
+            if done:
+                if run.error is not None:
+                    raise run.error
+                return
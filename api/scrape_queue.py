@@ -0,0 +1,142 @@
+import datetime
+import itertools
+import queue
+import re
+import threading
+import time
+
+from event_record import URGENCY_ORDER, urgency_for
+from thread_profiler import profile_in_thread
+
+
+# --- Urgency-first scrape scheduling ---
+# Detail pages (date + description) are the slow part of scraping, and only the first
+# batch of events is formatted. The list card already shows a rough date, so each card
+# gets an estimated urgency before its detail fetch and the fetches run from a priority
+# queue: events in the next three days are fetched, batched and formatted first, and a
+# scrape cut short by its deadline drops far-future events rather than imminent ones.
+
+_MONTHS = {name: i for i, names in enumerate(
+    [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",),
+     ("jun", "june"), ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"),
+     ("oct", "october"), ("nov", "november"), ("dec", "december")], start=1) for name in names}
+_WEEKDAYS = {name: i for i, names in enumerate(
+    [("mon", "monday"), ("tue", "tues", "tuesday"), ("wed", "wednesday"), ("thu", "thur", "thurs", "thursday"),
+     ("fri", "friday"), ("sat", "saturday"), ("sun", "sunday")]) for name in names}
+_MONTH_DAY_RE = re.compile(r"\b([A-Za-z]{3,9})\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4}))?")
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _nearest_date(month, day, today):
+    """Date for a month/day without a year: this year, or next year if long past."""
+    try:
+        candidate = datetime.date(today.year, month, day)
+    except ValueError:
+        return None
+    if (today - candidate).days > 180:
+        try:
+            candidate = datetime.date(today.year + 1, month, day)
+        except ValueError:
+            return None
+    return candidate
+
+
+def estimate_card_date(date_text, today):
+    """
+    Best-effort start date from a list card's date text ("Mon, May 5, 2025 3:00 PM",
+    "May 5 - May 9", "Today", "Tomorrow", "Friday"). For a range that has already
+    started but not ended, returns today. Returns None if nothing looks like a date.
+    """
+    if not date_text:
+        return None
+    text = date_text.strip()
+    dates = []
+    for match in _MONTH_DAY_RE.finditer(text):
+        month = _MONTHS.get(match.group(1).lower())
+        if not month:
+            continue
+        day = int(match.group(2))
+        if match.group(3):
+            try:
+                dates.append(datetime.date(int(match.group(3)), month, day))
+            except ValueError:
+                continue
+        else:
+            parsed = _nearest_date(month, day, today)
+            if parsed:
+                dates.append(parsed)
+    if dates:
+        start, end = dates[0], dates[-1]
+        if start > end and start.year == end.year: # "Dec 30 - Jan 2" seen in January
+            start = _nearest_date(start.month, start.day, end.replace(year=end.year - 1)) or start
+        return today if start < today <= end else start
+
+    words = _WORD_RE.findall(text.lower())
+    if "today" in words or "now" in words:
+        return today
+    if "tomorrow" in words:
+        return today + datetime.timedelta(days=1)
+    for word in words:
+        if word in _WEEKDAYS:
+            return today + datetime.timedelta(days=(_WEEKDAYS[word] - today.weekday()) % 7)
+    return None
+
+
+def card_priority(card_date, today, page_index):
+    """Sort key: estimated urgency, then soonest first, then page order. Undated cards go last."""
+    urgency = urgency_for(card_date, today)
+    days_out = (card_date - today).days if card_date and card_date >= today else 10 ** 6
+    return (URGENCY_ORDER[urgency], days_out, page_index)
+
+
+class PriorityWorkQueue:
+    """Work items run most-urgent-first on a small pool of threads."""
+
+    def __init__(self):
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+
+    def put(self, item, priority):
+        self._queue.put((priority, next(self._seq), item))
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def run(self, work, workers=4, deadline_seconds=None):
+        """
+        Calls work(item) for every queued item, always taking the highest-priority item
+        next. Items still queued when `deadline_seconds` runs out are not started.
+        Returns ([(item, result)] in priority order, skipped_count); skipped items are
+        included with result None.
+        """
+        deadline_at = time.monotonic() + deadline_seconds if deadline_seconds else None
+        results = {}
+        skipped = []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                try:
+                    priority, seq, item = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                if deadline_at is not None and time.monotonic() >= deadline_at:
+                    with lock:
+                        skipped.append(seq)
+                        results[seq] = (priority, item, None)
+                    continue
+                try:
+                    result = work(item)
+                except Exception as e:
+                    print(f"   ❌ Scrape task failed: {e}")
+                    result = None
+                with lock:
+                    results[seq] = (priority, item, result)
+
+        threads = [threading.Thread(target=profile_in_thread(worker), name=f"scrape-worker-{i}", daemon=True) for i in range(max(1, workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ordered = sorted(results.values(), key=lambda entry: entry[0])
+        return [(item, result) for _, item, result in ordered], len(skipped)
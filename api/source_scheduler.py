@@ -0,0 +1,140 @@
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scrape_queue import card_priority
+from sources import create_source
+from thread_profiler import profile_in_thread
+
+
+# --- Running many event sources from one process ---
+# Scrapes every configured source concurrently. Per source it keeps:
+# - a cache of the last successful scrape (fresh for SOURCE_CACHE_TTL_SECONDS), which
+#   is also served, stale, for up to SOURCE_MAX_STALE_SECONDS while the site is failing;
+# - health: state ('ok' / 'degraded' / 'down' / 'pending'), last success and error,
+#   consecutive failures, and an exponential retry backoff so a broken site isn't
+#   hammered on every request.
+# Request rate limits are per source too (see SourceExtractor.get).
+#
+# Sources come from EVENT_SOURCES, a JSON list of {"kind", "name", "url", ...options}:
+#
+#   EVENT_SOURCES='[{"kind": "purdue"}, {"kind": "purdue", "name": "iu", "url": "https://events.iu.edu/"}]'
+
+SOURCE_CACHE_TTL_SECONDS = int(os.getenv("SOURCE_CACHE_TTL_SECONDS", str(30 * 60)))
+SOURCE_MAX_STALE_SECONDS = int(os.getenv("SOURCE_MAX_STALE_SECONDS", str(6 * 3600)))
+SOURCE_BACKOFF_BASE_SECONDS = 30
+SOURCE_BACKOFF_MAX_SECONDS = 30 * 60
+DEFAULT_SOURCES = [{"kind": "purdue"}]
+
+
+def sources_from_config(config_text=None):
+    """Builds extractors from EVENT_SOURCES-style JSON (default: just Purdue). Raises ValueError on bad config."""
+    try:
+        entries = json.loads(config_text) if config_text else DEFAULT_SOURCES
+    except ValueError as e:
+        raise ValueError(f"EVENT_SOURCES is not valid JSON: {e}")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("EVENT_SOURCES must be a non-empty JSON list of sources.")
+    sources = []
+    for entry in entries:
+        options = dict(entry)
+        kind = options.pop("kind", None)
+        sources.append(create_source(kind, **options))
+    names = [source.name for source in sources]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Event source names must be unique, got {names}")
+    return sources
+
+
+class SourceScheduler:
+    def __init__(self, sources, cache_ttl=SOURCE_CACHE_TTL_SECONDS, max_stale=SOURCE_MAX_STALE_SECONDS):
+        self.sources = list(sources)
+        self.cache_ttl = cache_ttl
+        self.max_stale = max_stale
+        self.cache = {}       # name -> (events, scraped_at)
+        self.status = {source.name: {
+            "name": source.name, "kind": source.kind, "url": source.url, "state": "pending",
+            "events": 0, "last_success": None, "last_error": None, "last_error_at": None,
+            "last_duration": None, "consecutive_failures": 0, "retry_at": None,
+        } for source in self.sources}
+        self.lock = threading.Lock()
+        self.source_locks = {source.name: threading.Lock() for source in self.sources}
+
+    def _cached(self, name, max_age):
+        with self.lock:
+            entry = self.cache.get(name)
+        if entry and time.time() - entry[1] <= max_age:
+            return entry[0]
+        return None
+
+    def _scrape_source(self, source):
+        """Returns (events, error) for one source, using its cache and backoff."""
+        # One scrape per source at a time; a concurrent caller waits and then hits the cache.
+        with self.source_locks[source.name]:
+            fresh = self._cached(source.name, self.cache_ttl)
+            if fresh is not None:
+                print(f"🎯 [{source.name}] Using cached scrape ({len(fresh)} events).")
+                return fresh, None
+
+            status = self.status[source.name]
+            if status["retry_at"] and time.time() < status["retry_at"]:
+                stale = self._cached(source.name, self.max_stale)
+                print(f"⏸️ [{source.name}] Backing off after {status['consecutive_failures']} failures; "
+                      f"{'serving stale events' if stale is not None else 'skipping'}.")
+                return (stale, None) if stale is not None else ([], status["last_error"])
+
+            started = time.time()
+            try:
+                events, error = source.scrape()
+            except Exception as e:
+                events, error = [], f"Scraper crashed: {e}"
+            duration = time.time() - started
+
+            with self.lock:
+                status["last_duration"] = round(duration, 2)
+                if error:
+                    status["consecutive_failures"] += 1
+                    status["last_error"] = error
+                    status["last_error_at"] = started
+                    backoff = min(SOURCE_BACKOFF_MAX_SECONDS, SOURCE_BACKOFF_BASE_SECONDS * 2 ** (status["consecutive_failures"] - 1))
+                    status["retry_at"] = time.time() + backoff
+                else:
+                    self.cache[source.name] = (events, time.time())
+                    status.update(state="ok", events=len(events), last_success=started,
+                                  consecutive_failures=0, retry_at=None)
+
+            if error:
+                stale = self._cached(source.name, self.max_stale)
+                with self.lock:
+                    status["state"] = "degraded" if stale is not None else "down"
+                if stale is not None:
+                    print(f"⚠️ [{source.name}] Scrape failed ({error}); serving {len(stale)} stale events.")
+                    return stale, None
+            return events, error
+
+    def scrape_all(self, today=None):
+        """
+        Scrapes every source concurrently. Returns (events, errors) where events from all
+        sources are merged soonest first and errors maps source name -> error message.
+        """
+        today = today or datetime.date.today()
+        with ThreadPoolExecutor(max_workers=max(1, len(self.sources)), thread_name_prefix="source") as pool:
+            results = list(pool.map(profile_in_thread(self._scrape_source), self.sources))
+
+        errors = {}
+        ranked = []
+        for source, (events, error) in zip(self.sources, results):
+            if error:
+                errors[source.name] = error
+            for position, event in enumerate(events):
+                ranked.append((card_priority(event.start_date, today, position), event))
+        ranked.sort(key=lambda entry: entry[0]) # Stable: interleaves sources by urgency, then by their own order
+        return [event for _, event in ranked], errors
+
+    def health(self):
+        """JSON-ready status of every source."""
+        with self.lock:
+            return [dict(status) for status in self.status.values()]
@@ -0,0 +1,240 @@
+import datetime
+import os
+import re
+import time
+from urllib.parse import urljoin
+
+from event_record import EventRecord
+from rate_limit import TokenBucket
+from scrape_queue import PriorityWorkQueue, card_priority, estimate_card_date
+
+
+# --- Event source extractors ---
+# Each calendar site is a SourceExtractor: it lists the site's event cards and fills in
+# one event's details. Scheduling (urgency-first detail fetches, the scrape deadline and
+# per-site politeness limits) lives in the base class, so a new site only needs the two
+# markup-specific methods plus @register_extractor("<kind>"):
+#
+#   @register_extractor("mycampus")
+#   class MyCampusExtractor(SourceExtractor):
+#       default_url = "https://events.mycampus.edu/"
+#       def list_cards(self): ...          # [(EventRecord, card_date_text), ...]
+#       def fetch_details(self, event): ... # sets event.date / event.description
+#
+# Sources are then configured by kind (see source_scheduler.sources_from_config).
+
+# Detail pages are fetched concurrently, most urgent card first. With a deadline
+# (seconds, 0 = none), pages still queued when it runs out are skipped.
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "4"))
+SCRAPE_DEADLINE_SECONDS = float(os.getenv("SCRAPE_DEADLINE_SECONDS", "0"))
+# Politeness towards each site: sustained requests per second, and how many may go at once.
+SOURCE_REQUESTS_PER_SECOND = float(os.getenv("SOURCE_REQUESTS_PER_SECOND", "4"))
+SOURCE_REQUEST_BURST = int(os.getenv("SOURCE_REQUEST_BURST", "4"))
+
+# Browser-like Headers for Requests
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0',
+}
+
+EXTRACTORS = {}
+
+
+def register_extractor(kind):
+    """Class decorator adding an extractor to the registry under `kind`."""
+    def decorator(cls):
+        cls.kind = kind
+        EXTRACTORS[kind] = cls
+        return cls
+    return decorator
+
+
+def create_source(kind, **options):
+    """Builds a configured extractor. Raises ValueError for an unknown kind."""
+    cls = EXTRACTORS.get(kind)
+    if cls is None:
+        raise ValueError(f"Unknown event source kind {kind!r} (known: {', '.join(sorted(EXTRACTORS))})")
+    return cls(**options)
+
+
+class SourceExtractor:
+    """
+    One event calendar. Subclasses implement list_cards() and fetch_details(); scrape()
+    runs them with urgency-first scheduling and this source's request rate limit.
+    """
+    kind = None
+    default_url = None
+
+    def __init__(self, name=None, url=None, concurrency=SCRAPE_CONCURRENCY, deadline_seconds=SCRAPE_DEADLINE_SECONDS,
+                 requests_per_second=SOURCE_REQUESTS_PER_SECOND, burst=SOURCE_REQUEST_BURST):
+        self.url = url or self.default_url
+        self.name = name or self.kind
+        self.concurrency = concurrency
+        self.deadline_seconds = deadline_seconds
+        self.throttle = TokenBucket(requests_per_second, burst)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name} {self.url}>"
+
+    def get(self, url, timeout=15):
+        """Rate-limited GET with the browser-like headers. Raises on HTTP errors."""
+        import requests
+        while True:
+            allowed, retry_after = self.throttle.try_acquire()
+            if allowed:
+                break
+            time.sleep(min(retry_after, 5.0))
+        response = requests.get(url, headers=REQUEST_HEADERS, timeout=timeout)
+        response.raise_for_status()
+        return response
+
+    def list_cards(self):
+        """Returns [(EventRecord with list-page fields, card_date_text)] in page order. May raise."""
+        raise NotImplementedError
+
+    def fetch_details(self, event):
+        """Fills in event.date and event.description from the detail page. Shouldn't raise."""
+        raise NotImplementedError
+
+    def scrape(self, today=None):
+        """
+        Lists the cards, then fetches details most-urgent-first.
+        Returns (events, error); events are ordered soonest first, tagged with .source and
+        carry their estimated .start_date.
+        """
+        today = today or datetime.date.today()
+        print(f"🟡 [{self.name}] Requesting data from {self.url}...")
+        try:
+            cards = self.list_cards()
+        except Exception as e:
+            print(f"❌ [{self.name}] Error fetching list URL {self.url}: {e}")
+            return [], f"Error fetching event list: {e}"
+        print(f"🔍 [{self.name}] Found {len(cards)} event cards.")
+
+        work_queue = PriorityWorkQueue()
+        for page_index, (event, card_date_text) in enumerate(cards):
+            event.source = self.name
+            work_queue.put((event, card_date_text, page_index),
+                           card_priority(estimate_card_date(card_date_text, today), today, page_index))
+
+        def fill_details(task):
+            event, _, _ = task
+            if event.link:
+                self.fetch_details(event)
+            return True
+
+        print(f"🗓️ [{self.name}] Fetching {len(work_queue)} detail pages, soonest events first (concurrency={self.concurrency})...")
+        done, skipped = work_queue.run(fill_details, workers=self.concurrency, deadline_seconds=self.deadline_seconds)
+        if skipped:
+            print(f"   ⏰ [{self.name}] Scrape deadline reached; skipped {skipped} lower-priority detail pages.")
+
+        # Re-rank with the detail page's date where we got one (it's more precise than the card's).
+        ranked = []
+        for (event, card_date_text, page_index), _ in done:
+            event.start_date = estimate_card_date((event.date or "").split(";")[0], today) or estimate_card_date(card_date_text, today)
+            ranked.append((card_priority(event.start_date, today, page_index), event))
+        ranked.sort(key=lambda entry: entry[0])
+        events = [event for _, event in ranked]
+        print(f"✅ [{self.name}] Extracted {len(events)} events.")
+        return events, None
+
+
+@register_extractor("purdue")
+class PurdueExtractor(SourceExtractor):
+    """
+    events.purdue.edu: '.em-card' cards on the list page, header dates in
+    'div.em-list_dates__container' and the description in 'div.em-about_description'
+    on each detail page. Works for any calendar using the same markup (set `url`).
+    """
+    default_url = "https://events.purdue.edu/"
+
+    def list_cards(self):
+        from bs4 import BeautifulSoup
+
+        list_response = self.get(self.url, timeout=20)
+        list_soup = BeautifulSoup(list_response.text, 'lxml')
+        cards = []
+        for el in list_soup.select(".em-card"):
+            # --- Extract basic info from List Page Card (el) ---
+            title_tag = el.select_one(".em-card_title a")
+            title = title_tag.text.strip() if title_tag else None
+            if not title:
+                continue
+
+            # The first event-text line on a card is its date/time, e.g. "Mon, May 5, 2025 3:00 PM"
+            date_text_tag = el.select_one(".em-card_event-text")
+            card_date_text = date_text_tag.get_text(" ", strip=True) if date_text_tag else None
+
+            # Location from List Page (basic attempt)
+            location_tag = el.select_one(".em-card_event-text a")
+            location = location_tag.text.strip() if location_tag else None
+            if not location:
+                # Sometimes location is not a link but just text after date
+                 if date_text_tag and date_text_tag.find_next_sibling(class_="em-card_event-text"):
+                    possible_loc_tag = date_text_tag.find_next_sibling(class_="em-card_event-text")
+                    if possible_loc_tag and not possible_loc_tag.find('a'): # Ensure it's not another link (like time)
+                        location = possible_loc_tag.text.strip()
+
+            # Link and Image from List Page
+            link = title_tag['href'] if title_tag.has_attr('href') else None
+            full_link = urljoin(self.url, link) if link and link.startswith('/') else link
+            img_tag = el.select_one("img")
+            img_src = img_tag['src'] if img_tag and img_tag.has_attr('src') else None
+            full_image = urljoin(self.url, img_src) if img_src and img_src.startswith('/') else img_src
+
+            cards.append((EventRecord(title=title, location=location, link=full_link, image=full_image), card_date_text))
+        return cards
+
+    def fetch_details(self, event):
+        import requests
+        from bs4 import BeautifulSoup
+
+        try:
+            detail_soup = BeautifulSoup(self.get(event.link, timeout=15).text, 'lxml')
+
+            # --- Extract Date from Detail Page Header ---
+            primary_date_str = None
+            additional_dates_str = None
+            date_container = detail_soup.select_one("div.em-list_dates__container")
+            if date_container:
+                primary_date_tag = date_container.select_one("p.em-date")
+                if primary_date_tag:
+                    primary_date_str = primary_date_tag.get_text(strip=True)
+
+                # Extracting additional dates from aria-label
+                extra_dates_msg_tag = date_container.select_one("div.em-list_dates__extra-message")
+                if extra_dates_msg_tag and extra_dates_msg_tag.has_attr('aria-label'):
+                    aria_label_text = extra_dates_msg_tag['aria-label']
+                    # Use regex to clean potential prefixes
+                    cleaned_aria_label = re.sub(
+                        r'^(Additional Event Dates:|Additional Event y,|Additional Dates:)\s*', '',
+                        aria_label_text, flags=re.IGNORECASE
+                    ).strip()
+                    if cleaned_aria_label:
+                         additional_dates_str = cleaned_aria_label
+
+                # Combine Dates
+                if primary_date_str and additional_dates_str:
+                    event.date = f"{primary_date_str}; {additional_dates_str}"
+                elif primary_date_str:
+                    event.date = primary_date_str
+
+            # --- Extract Description from Detail Page ---
+            description_tag = detail_soup.select_one("div.em-about_description")
+            if description_tag:
+                event.description = description_tag.get_text(separator="\n", strip=True)
+            # Events without a description pass scraping and are filtered later
+
+        except requests.exceptions.RequestException as detail_err:
+            print(f"   ❌ Error fetching detail page {event.link}: {detail_err}")
+        except Exception as parse_err:
+            print(f"   ❌ Error parsing detail page {event.link}: {parse_err}")
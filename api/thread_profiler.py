@@ -0,0 +1,73 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import threading
+
+
+# --- CPU profiling across worker threads ---
+# cProfile only sees the thread that enabled it, but most of a /events request runs
+# elsewhere: source scrapes on the scheduler pool, detail pages on scrape workers and
+# OpenAI calls on hedge attempt threads. Code that hands work to another thread wraps the
+# callable with profile_in_thread() on the submitting thread; while a request is being
+# CPU-profiled (collecting_thread_profiles), the wrapped call runs under its own profiler
+# and is collected for merging into the request's .prof. Kept free of Flask so the
+# scraper and hedging modules can use it from the CLI and benchmarks.
+
+_collector = contextvars.ContextVar("thread_profile_collector", default=None)
+
+
+class ThreadProfiles:
+    """Profilers of the worker threads that ran on behalf of one profiled request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profilers = []
+
+    def add(self, profiler):
+        with self.lock:
+            self.profilers.append(profiler)
+
+    def drain(self):
+        with self.lock:
+            profilers, self.profilers = self.profilers, []
+        return profilers
+
+
+@contextlib.contextmanager
+def collecting_thread_profiles():
+    """Collects profiles of work wrapped with profile_in_thread() in this context."""
+    profiles = ThreadProfiles()
+    token = _collector.set(profiles)
+    try:
+        yield profiles
+    finally:
+        _collector.reset(token)
+
+
+def profile_in_thread(fn):
+    """
+    Call on the submitting thread. Returns `fn` unchanged unless a profile is being
+    collected; otherwise a wrapper that profiles the call on whatever thread runs it
+    (and passes the collection on to threads it starts in turn).
+    """
+    profiles = _collector.get()
+    if profiles is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _collector.set(profiles)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError: # Python 3.12+: one profiler at a time, and the request's already sees every thread
+            profiler = None
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiles.add(profiler)
+            _collector.reset(token)
+    return wrapper